@@ -0,0 +1,7 @@
+"""
+Analysis modules for the data the example sets write out (set 3 data and log
+files) and for the like/dislike analysis walked through in set4/using_pandas.ipynb.
+
+Add the intro-to-psychopy root to sys.path and import what you need,
+ie. `from analysis.log_parser import parse_log`
+"""
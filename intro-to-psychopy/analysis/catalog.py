@@ -0,0 +1,132 @@
+"""
+Find and pair every subject's events and rec files, remembering what was found.
+
+The notebook walks both data folders with os.walk + glob on every restart,
+then checks the pairing by cutting [:-7] and [:-18] off the sorted file names.
+SubjectCatalog instead keeps a manifest (a json file) of every folder it has
+scanned: the folder's mtime, its subfolders and each data file's size and
+mtime. On the next scan a folder whose mtime hasn't changed is taken from the
+manifest without listing it, so on a network share only the folders that got
+new or removed files are read again. (Changing a file in place doesn't change
+its folder's mtime; use scan(full=True) after editing files.)
+
+Files are paired by the subject id parsed from their names
+(cdcatbeh078rec.csv and cdcatbeh078cat_all_events.csv -> cdcatbeh078),
+and subjects missing either file are listed instead of breaking the pairing.
+
+    catalog = SubjectCatalog(recDir, eventsDir, dataDir + '/test_data/catalog.json')
+    subjects = catalog.scan()
+    pairs = catalog.pairs()     # [(events file, rec file), ...] sorted by subject
+"""
+from __future__ import absolute_import, division, print_function
+import io
+import json
+import os
+import re
+
+import pandas as pd
+
+from analysis.like_dislike import EVENTS_SUFFIX, RECALL_SUFFIX
+
+MANIFEST_VERSION = 1
+
+
+class SubjectCatalog(object):
+
+    def __init__(self, rec_dir, events_dir, manifest_path, rec_suffix=RECALL_SUFFIX, events_suffix=EVENTS_SUFFIX):
+        self.rec_dir = os.path.abspath(rec_dir)
+        self.events_dir = os.path.abspath(events_dir)
+        self.manifest_path = manifest_path
+        self.patterns = {
+            'rec': re.compile('^(.+)' + re.escape(rec_suffix) + '$'),
+            'events': re.compile('^(.+)' + re.escape(events_suffix) + '$'),
+        }
+        self.dirs = self._load_manifest()
+        self.subjects = None
+        self.unpaired = []
+        self.n_listed = 0  # folders actually listed by the last scan
+
+    def _load_manifest(self):
+        if not os.path.exists(self.manifest_path):
+            return {}
+        try:
+            with io.open(self.manifest_path, 'r', encoding='utf8') as f:
+                manifest = json.load(f)
+        except ValueError:
+            return {}
+        if manifest.get('version') != MANIFEST_VERSION:
+            return {}
+        return manifest['dirs']
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path + '.tmp'
+        with io.open(tmp_path, 'w', encoding='utf8') as f:
+            f.write(json.dumps({'version': MANIFEST_VERSION, 'dirs': self.dirs}))
+        os.replace(tmp_path, self.manifest_path)
+
+    def _scan_dir(self, path, kind, full, seen):
+        # files of kind under path, listing only folders that changed since the manifest was saved
+        # rec and events files may share a folder, so folders are kept per kind
+        key = kind + ':' + path
+        seen.add(key)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return []
+        entry = self.dirs.get(key)
+        if full or entry is None or entry['mtime'] != mtime:
+            files = {}
+            subdirs = []
+            for item in os.scandir(path):
+                if item.is_dir():
+                    subdirs.append(item.path)
+                elif self.patterns[kind].match(item.name):
+                    stat = item.stat()
+                    files[item.name] = [stat.st_size, stat.st_mtime]
+            entry = {'mtime': mtime, 'files': files, 'subdirs': sorted(subdirs)}
+            self.dirs[key] = entry
+            self.n_listed += 1
+
+        found = [(name, os.path.join(path, name), size, file_mtime)
+                 for name, (size, file_mtime) in entry['files'].items()]
+        for subdir in entry['subdirs']:
+            found.extend(self._scan_dir(subdir, kind, full, seen))
+        return found
+
+    def scan(self, full=False):
+        """
+        Update the manifest and return one row per paired subject with
+        subject, events_path, events_size, events_mtime, rec_path, rec_size, rec_mtime.
+        Subjects with only one of the two files end up in self.unpaired.
+        """
+        self.n_listed = 0
+        seen = set()
+        tables = {}
+        for kind, root in [('events', self.events_dir), ('rec', self.rec_dir)]:
+            rows = []
+            for name, path, size, mtime in self._scan_dir(root, kind, full, seen):
+                subject = self.patterns[kind].match(name).group(1)
+                rows.append((subject, path, size, mtime))
+            table = pd.DataFrame(rows, columns=['subject', kind + '_path', kind + '_size', kind + '_mtime'])
+            duplicated = table['subject'].duplicated(keep=False)
+            if duplicated.any():
+                raise ValueError('more than one ' + kind + ' file for subject(s) '
+                                 + str(sorted(set(table['subject'][duplicated]))))
+            tables[kind] = table
+
+        # forget folders that don't exist anymore
+        self.dirs = dict((key, entry) for key, entry in self.dirs.items() if key in seen)
+        self._save_manifest()
+
+        merged = tables['events'].merge(tables['rec'], on='subject', how='outer', indicator=True)
+        self.unpaired = sorted(merged.loc[merged['_merge'] != 'both', 'subject'].tolist())
+        subjects = merged[merged['_merge'] == 'both'].drop(columns=['_merge'])
+        subjects = subjects.astype({'events_size': 'int64', 'rec_size': 'int64'})
+        self.subjects = subjects.sort_values('subject').reset_index(drop=True)
+        return self.subjects
+
+    def pairs(self):
+        # [(events file, rec file), ...] of the paired subjects, sorted by subject
+        if self.subjects is None:
+            self.scan()
+        return list(zip(self.subjects['events_path'], self.subjects['rec_path']))
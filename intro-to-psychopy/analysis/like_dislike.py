@@ -0,0 +1,165 @@
+"""
+Like/dislike counts of the cdcatmr events files, as in set4/using_pandas.ipynb.
+
+The notebook goes through every events file row by row with events.iloc[i],
+collects the stim_pres rows in a list, and counts the liked ('period') and
+disliked ('slash') items with collections.Counter. Here the same numbers come
+from the events of all subjects at once, with the items as int32 codes of an
+ItemVocab (analysis.vocab) counted by np.bincount:
+
+    events = read_events(all_events)
+    summary = like_dislike_summary(events)
+    summary['liked_percent'], summary['top_liked']
+
+Ties in the top-N lists are broken by which item came first, like
+Counter.most_common does.
+"""
+from __future__ import absolute_import, division, print_function
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+if __name__ == '__main__':
+    # run as python analysis/like_dislike.py: make the analysis package importable, as in helpers/sessions.py
+    ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    if ROOT_DIR not in sys.path:
+        sys.path.insert(0, ROOT_DIR)
+
+from analysis.readers import EVENTS_DTYPES, concat_categorical, read_columns
+from analysis.vocab import ItemVocab, count_codes, most_common_codes
+
+LIKE_KEY = 'period'
+DISLIKE_KEY = 'slash'
+STIM_TYPE = 'stim_pres'
+EVENTS_SUFFIX = 'cat_all_events.csv'
+# responses are encoded with this, so LIKE_KEY is code 0 and DISLIKE_KEY code 1
+RESPONSES = ItemVocab([LIKE_KEY, DISLIKE_KEY])
+RECALL_SUFFIX = 'rec.csv'
+
+
+def encode_responses(resp):
+    # 0 for a like, 1 for a dislike, -1 for any other key or no response
+    return RESPONSES.encode(resp, unknown='ignore')
+
+
+def subject_id(path, suffix=EVENTS_SUFFIX):
+    # cdcatbeh078cat_all_events.csv -> cdcatbeh078
+    name = os.path.basename(path)
+    return name[:-len(suffix)] if name.endswith(suffix) else os.path.splitext(name)[0]
+
+
+def read_events(paths, columns=('types', 'resp', 'item', 'trialN')):
+    # events files of all subjects as one DataFrame with categorical subject, types, resp and item columns
+    dtypes = dict((name, EVENTS_DTYPES.get(name, 'object')) for name in columns)
+    frames = []
+    for path in paths:
+        events = read_columns(path, dtypes)
+        events.insert(0, 'subject', pd.Categorical([subject_id(path)] * len(events)))
+        frames.append(events)
+    return concat_categorical(frames, [('subject', 'category')] + [(name, dtypes[name]) for name in columns])
+
+
+def stim_presentations(events):
+    return events[(events['types'] == STIM_TYPE).to_numpy()]
+
+
+def most_common(items, n=None):
+    """
+    [(item, count), ...] sorted by count like Counter(items).most_common(n),
+    with ties in order of first appearance.
+    """
+    vocab = ItemVocab.from_values(items)
+    return most_common_codes(vocab.encode(items), vocab, n)
+
+
+def _encode_stims(events, vocab=None):
+    # item and response codes of the stim_pres events
+    stims = stim_presentations(events)
+    if vocab is None:
+        vocab = ItemVocab.from_values(stims['item'])
+    return stims, vocab, vocab.encode(stims['item']), encode_responses(stims['resp'])
+
+
+def item_counts(events, vocab=None):
+    """
+    Number of likes and dislikes per item over all subjects' stim_pres events,
+    as a DataFrame indexed by item with columns liked, disliked.
+    Pass the study's ItemVocab (study_vocab()) as vocab to share it between
+    calls; items it doesn't have yet are added to it.
+    """
+    stims, vocab, items, resp = _encode_stims(events, vocab)
+    liked = count_codes(items[resp == 0], len(vocab))
+    disliked = count_codes(items[resp == 1], len(vocab))
+    keep = np.flatnonzero((liked > 0) | (disliked > 0))
+    return pd.DataFrame({'liked': liked[keep].astype(np.int64), 'disliked': disliked[keep].astype(np.int64)},
+                        index=pd.Index(vocab.decode(keep), name='item'))
+
+
+def subject_counts(events):
+    # likes and dislikes per subject, as a DataFrame indexed by subject
+    stims = stim_presentations(events)
+    subjects = ItemVocab.from_values(stims['subject'])
+    codes = subjects.encode(stims['subject'])
+    resp = encode_responses(stims['resp'])
+    return pd.DataFrame({
+        'liked': count_codes(codes[resp == 0], len(subjects)).astype(np.int64),
+        'disliked': count_codes(codes[resp == 1], len(subjects)).astype(np.int64),
+    }, index=pd.Index(subjects.names, dtype=object))
+
+
+def like_dislike_summary(events, top_n=10, vocab=None):
+    """
+    The numbers printed in the notebook:
+    liked, disliked        -- total number of likes and dislikes
+    liked_percent, disliked_percent -- as a proportion of likes + dislikes
+    top_liked, top_disliked -- [(item, count), ...] of the top_n items
+    """
+    stims, vocab, items, resp = _encode_stims(events, vocab)
+    liked_items = items[resp == 0]
+    disliked_items = items[resp == 1]
+    n_liked, n_disliked = len(liked_items), len(disliked_items)
+    total = n_liked + n_disliked
+    return {
+        'liked': n_liked,
+        'disliked': n_disliked,
+        'liked_percent': n_liked / total if total else np.nan,
+        'disliked_percent': n_disliked / total if total else np.nan,
+        'top_liked': most_common_codes(liked_items, vocab, top_n),
+        'top_disliked': most_common_codes(disliked_items, vocab, top_n),
+    }
+
+
+def study_vocab(paths):
+    # ItemVocab of the items shown in all the events files, in order of first appearance
+    vocab = ItemVocab()
+    for path in paths:
+        vocab.extend(stim_presentations(read_events([path], columns=('types', 'item')))['item'])
+    return vocab
+
+
+def subject_item_counts(pair, vocab=None):
+    """
+    item_counts of one subject, for analysis.parallel.map_reduce with combine=add_tables.
+    pair is the subject's (events file, rec file), or just the events file.
+    Bind the study's vocabulary to share it between the subjects (every worker
+    process gets a copy of it):
+
+        count = functools.partial(subject_item_counts, vocab=study_vocab(all_events))
+        counts = map_reduce(count, all_events, combine=add_tables)
+    """
+    events_path = pair[0] if isinstance(pair, (tuple, list)) else pair
+    return item_counts(read_events([events_path]), vocab)
+
+
+if __name__ == '__main__':
+    from glob import glob
+    eventsDir = sys.argv[1]
+    all_events = sorted(y for x in os.walk(eventsDir) for y in glob(os.path.join(x[0], '*' + EVENTS_SUFFIX)))
+    print('Found ' + str(len(all_events)) + ' subjects.')
+    summary = like_dislike_summary(read_events(all_events))
+    print('likes %: ' + str(summary['liked_percent']))
+    print('dislikes %: ' + str(summary['disliked_percent']))
+    print(summary['top_liked'])
+    print(summary['top_disliked'])
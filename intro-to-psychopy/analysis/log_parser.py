@@ -0,0 +1,151 @@
+"""
+Read PsychoPy .log files (like the ones set 3 writes) back into DataFrames.
+
+Each log line looks like
+
+    12.0167 \tDATA \tstart concept word: pepper
+
+ie. time, level and message separated by ' \\t'. The file is read a chunk of
+lines at a time and every chunk is split with pandas' vectorized string
+methods, so memory stays bounded by chunk_lines however big the log is.
+
+The stimulus events are picked out of the messages:
+
+    start concept word: <item>   -> event 'concept'
+    start stopwords: <item>      -> event 'stopword'
+    start target word: <item>    -> event 'target'
+    start response: <item>       -> event 'response'
+    start time out: <item>       -> event 'timeout'
+    key <key> down: <rt> held: <duration>  -> event 'key'
+
+Every 'concept' event starts a new trial, which gives the trial column.
+"""
+from __future__ import absolute_import, division, print_function
+import glob
+import io
+import os
+from itertools import islice
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+
+EVENT_NAMES = ['concept', 'stopword', 'target', 'response', 'timeout', 'key']
+LEVEL_NAMES = ['CRITICAL', 'ERROR', 'WARNING', 'DATA', 'EXP', 'INFO', 'DEBUG']
+
+_START_EVENTS = {
+    'concept word': 'concept',
+    'stopwords': 'stopword',
+    'target word': 'target',
+    'response': 'response',
+    'time out': 'timeout',
+}
+_START_PATTERN = r'^start (' + '|'.join(_START_EVENTS) + r'): (.*)$'
+_KEY_PATTERN = r'^key (\S+) down: (\S+) held: (\S+)$'
+
+
+def split_lines(lines):
+    """
+    Split raw log lines into a DataFrame with t (float), level (category) and message.
+    Lines that don't look like log lines get NaN for t.
+    """
+    lines = pd.Series(lines, dtype=object).str.rstrip('\r\n')
+    parts = lines.str.split(' \t', n=2, expand=True)
+    # make sure there are three string columns even if no line had a message
+    parts = parts.reindex(columns=[0, 1, 2]).astype(object).fillna('')
+    return pd.DataFrame({
+        't': pd.to_numeric(parts[0], errors='coerce'),
+        'level': pd.Categorical(parts[1].str.strip(), categories=LEVEL_NAMES),
+        'message': parts[2],
+    })
+
+
+def parse_events(lines):
+    """
+    Stimulus and key events of split_lines(lines), with columns
+    t, event (category), item, key_rt, key_held.
+    """
+    lines = lines[lines['t'].notna()]
+    start = lines['message'].str.extract(_START_PATTERN)
+    key = lines['message'].str.extract(_KEY_PATTERN)
+    is_start = start[0].notna()
+    is_key = key[0].notna()
+
+    event = start[0].map(_START_EVENTS)
+    event[is_key] = 'key'
+    item = start[1].where(is_start, key[0])
+    keep = (is_start | is_key).to_numpy()
+    return pd.DataFrame({
+        't': lines['t'].to_numpy(dtype=np.float64)[keep],
+        'event': pd.Categorical(event.to_numpy()[keep], categories=EVENT_NAMES),
+        'item': item.to_numpy()[keep],
+        'key_rt': pd.to_numeric(key[1], errors='coerce').to_numpy(dtype=np.float64)[keep],
+        'key_held': pd.to_numeric(key[2], errors='coerce').to_numpy(dtype=np.float64)[keep],
+    })
+
+
+def iter_log_events(path, chunk_lines=200000):
+    """
+    Yield the events of a log file a chunk at a time, with a trial column
+    (-1 for events before the first concept word).
+    """
+    n_trials = 0
+    with io.open(path, 'r', encoding='utf8', errors='replace') as f:
+        while True:
+            lines = list(islice(f, chunk_lines))
+            if not lines:
+                break
+            events = parse_events(split_lines(lines))
+            starts = (events['event'] == 'concept').to_numpy()
+            events['trial'] = np.cumsum(starts) + n_trials - 1
+            n_trials += int(starts.sum())
+            yield events
+
+
+def _empty_events():
+    events = parse_events(split_lines([]))
+    events['trial'] = np.zeros(0, dtype=np.int64)
+    return events
+
+
+def parse_log(path, chunk_lines=200000):
+    # all events of one log file, with the file name (without .log) as session
+    chunks = list(iter_log_events(path, chunk_lines))
+    events = pd.concat(chunks, ignore_index=True) if chunks else _empty_events()
+    events.insert(0, 'session', os.path.splitext(os.path.basename(path))[0])
+    return events
+
+
+def _parse_log_args(args):
+    return parse_log(*args)
+
+
+def parse_log_files(paths, processes=None, chunk_lines=200000):
+    """
+    Parse every log file in paths, in parallel with a pool of `processes`
+    workers (all cores by default). Returns one DataFrame with a categorical
+    session column.
+    """
+    if len(paths) <= 1 or processes == 1:
+        frames = [parse_log(path, chunk_lines) for path in paths]
+    else:
+        pool = Pool(processes)
+        try:
+            frames = pool.map(_parse_log_args, [(path, chunk_lines) for path in paths])
+        finally:
+            pool.close()
+            pool.join()
+    if not frames:
+        events = _empty_events()
+        events.insert(0, 'session', pd.Series([], dtype=object))
+        frames = [events]
+    events = pd.concat(frames, ignore_index=True)
+    events['session'] = events['session'].astype('category')
+    events['event'] = pd.Categorical(events['event'], categories=EVENT_NAMES)
+    return events
+
+
+def parse_log_dir(directory, pattern='*.log', processes=None, chunk_lines=200000):
+    # parse_log_files for every file in directory matching pattern
+    paths = sorted(glob.glob(os.path.join(directory, pattern)))
+    return parse_log_files(paths, processes, chunk_lines)
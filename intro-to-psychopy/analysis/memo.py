@@ -0,0 +1,146 @@
+"""
+Disk cache of per-subject analysis results, keyed by the content of the input files.
+
+Rerunning the notebook recomputes every subject from the raw csvs even if only
+one new subject came in. Memoized wraps a per-subject function (one that takes
+a subject's (events file, rec file) pair, ie. the subject_* functions) so that
+its result is saved to disk under a key made of
+
+- the function's module, name and `version` (bump it when the analysis changes),
+  and for a functools.partial the repr of the arguments it binds
+- the sha1 of every input file's content
+
+and loaded from there the next time the same files come in. Hashing a file
+means reading it, so each file's hash is also stored with its size and mtime
+and only recomputed when those change.
+
+The results folder is kept under max_bytes by deleting the least recently
+used results first, down to 90% of max_bytes. Sizes are kept as a running
+total, so the folder is only scanned the first time and when the results
+written since then take it over the limit. Memoized objects can be passed to
+analysis.parallel:
+
+    recall_counts = Memoized(subject_recall_counts, cacheDir, version=1)
+    table = map_reduce(recall_counts, pairs, combine=add_tables)
+"""
+from __future__ import absolute_import, division, print_function
+import functools
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+from helpers.stim_loader import file_hash
+
+EVICT_TO = 0.9
+
+
+def _write_atomic(path, data):
+    # write to a temporary file and rename it into place, so readers (and other processes) never see half a file
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+class Memoized(object):
+
+    def __init__(self, function, cache_dir, version=1, max_bytes=1 << 30):
+        self.function = function
+        self.cache_dir = cache_dir
+        self.version = version
+        self.max_bytes = max_bytes
+        self.results_dir = os.path.join(cache_dir, 'results')
+        self.hashes_dir = os.path.join(cache_dir, 'hashes')
+        for path in (self.results_dir, self.hashes_dir):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        self.hits = 0
+        self.misses = 0
+        # bytes in results_dir as of the last scan plus what this process wrote since (None: not scanned yet);
+        # results written by other processes only show up at the next scan
+        self._total = None
+
+    def content_hash(self, path):
+        # sha1 of the file's content, reusing the stored one while size and mtime are the same
+        stat = os.stat(path)
+        record_path = os.path.join(self.hashes_dir, hashlib.sha1(os.path.abspath(path).encode('utf8')).hexdigest())
+        try:
+            with open(record_path) as f:
+                record = json.load(f)
+            if record['size'] == stat.st_size and record['mtime'] == stat.st_mtime:
+                return record['sha1']
+        except (IOError, OSError, ValueError, KeyError):
+            pass
+        digest = file_hash(path)
+        record = {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': digest}
+        _write_atomic(record_path, json.dumps(record).encode('utf8'))
+        return digest
+
+    def function_parts(self):
+        # module and name of the function, unwrapping functools.partial (ie. subject_item_counts with vocab
+        # bound) into the wrapped function and the repr of what it binds
+        function = self.function
+        bound = []
+        while isinstance(function, functools.partial):
+            bound += [repr(arg) for arg in function.args]
+            bound += [name + '=' + repr(value) for name, value in sorted(function.keywords.items())]
+            function = function.func
+        for text in bound:
+            if ' at 0x' in text:
+                # the default object repr changes from run to run, so the results would never be found again
+                raise ValueError('cannot memoize ' + repr(self.function) + ': ' + text
+                                 + ' has no repr that stays the same between runs')
+        return [function.__module__, function.__name__] + bound
+
+    def key(self, paths):
+        parts = self.function_parts() + [str(self.version)]
+        parts += [self.content_hash(path) for path in paths]
+        return hashlib.sha1('\n'.join(parts).encode('utf8')).hexdigest()
+
+    def __call__(self, pair):
+        paths = list(pair) if isinstance(pair, (tuple, list)) else [pair]
+        result_path = os.path.join(self.results_dir, self.key(paths) + '.pkl')
+        try:
+            with open(result_path, 'rb') as f:
+                result = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            pass
+        else:
+            self.hits += 1
+            # mark as recently used for the eviction
+            os.utime(result_path, None)
+            return result
+
+        self.misses += 1
+        result = self.function(pair)
+        data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        _write_atomic(result_path, data)
+        if self._total is not None:
+            self._total += len(data)
+        if self._total is None or self._total > self.max_bytes:
+            self.evict()
+        return result
+
+    def evict(self):
+        # delete the least recently used results until the folder is under 90% of max_bytes,
+        # so the next few results fit without another scan
+        limit = int(self.max_bytes * EVICT_TO)
+        entries = []
+        total = 0
+        for item in os.scandir(self.results_dir):
+            if item.name.endswith('.pkl'):
+                stat = item.stat()
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total <= limit:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+        self._total = total
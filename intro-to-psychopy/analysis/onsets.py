@@ -0,0 +1,90 @@
+"""
+Attach the stimulus onsets from the .log files to the rows of the trial data.
+
+The trial csv only has globaltime, taken at the end of every trial, while the
+onset of every word is in the log (win.logOnFlip). Both use globalClock, so
+each logged event belongs to the first trial that ended at or after it.
+That is a sorted as-of join (pd.merge_asof) by session, done for every
+subject at once instead of searching trial by trial.
+
+A resumed session restarts globalClock, so within a session the data and the
+log are split into runs wherever the time goes backwards and joined run by run.
+
+    trials = read_trial_files(glob('set3/*_beh_*.csv'))
+    events = parse_log_files(glob('set3/*_beh_*.log'))   # analysis.log_parser
+    table = onset_table(trials, events)
+"""
+from __future__ import absolute_import, division, print_function
+import os
+
+import numpy as np
+import pandas as pd
+
+# events that get an onset column, in the order they are shown
+ONSET_EVENTS = ['concept', 'stopword', 'target', 'response', 'timeout']
+
+
+def read_trial_files(paths):
+    # trial data csvs (from set 3) as one DataFrame, with the file name as session and the row as trial
+    frames = []
+    for path in paths:
+        data = pd.read_csv(path)
+        data.insert(0, 'session', os.path.splitext(os.path.basename(path))[0])
+        data.insert(1, 'trial', np.arange(len(data)))
+        frames.append(data)
+    return pd.concat(frames, ignore_index=True)
+
+
+def _runs(frame, time_column):
+    # number the runs within each session: a new run starts when the clock goes backwards
+    back = frame.groupby('session', sort=False, observed=True)[time_column].diff() < 0
+    return back.astype(np.int64).groupby(frame['session'], sort=False, observed=True).cumsum()
+
+
+def attach_onsets(trials, events):
+    """
+    Long table of every onset event with the session and trial it belongs to:
+    session, trial, event, item, t, n (1, 2, ... for repeated events within a trial).
+    trials needs session, trial and globaltime; events comes from analysis.log_parser.
+    """
+    events = events[events['event'].isin(ONSET_EVENTS)].copy()
+    events['session'] = events['session'].astype(str)
+    events['run'] = _runs(events, 't')
+    events = events.drop(columns=['trial'], errors='ignore')
+
+    ends = trials[['session', 'trial', 'globaltime']].copy()
+    ends['session'] = ends['session'].astype(str)
+    ends['run'] = _runs(ends, 'globaltime')
+    ends['key'] = ends['session'] + '/' + ends['run'].astype(str)
+    events['key'] = events['session'] + '/' + events['run'].astype(str)
+
+    joined = pd.merge_asof(events.sort_values('t'), ends[['key', 'trial', 'globaltime']].sort_values('globaltime'),
+                           left_on='t', right_on='globaltime', by='key', direction='forward')
+    joined = joined[joined['trial'].notna()]
+    joined['trial'] = joined['trial'].astype(np.int64)
+    joined = joined.sort_values(['session', 'trial', 't'], kind='stable')
+    joined['n'] = joined.groupby(['session', 'trial', 'event'], observed=True).cumcount() + 1
+    return joined[['session', 'trial', 'event', 'item', 't', 'n']].reset_index(drop=True)
+
+
+def onset_table(trials, events):
+    """
+    One row per trial with the trial data plus an onset column per event:
+    concept, stopword_1, stopword_2, ..., target, response, timeout
+    (NaN when it wasn't shown, ie. timeout for trials with a response).
+    """
+    onsets = attach_onsets(trials, events)
+    repeated = onsets['event'] == 'stopword'
+    onsets['column'] = onsets['event'].astype(str)
+    onsets.loc[repeated, 'column'] = 'stopword_' + onsets.loc[repeated, 'n'].astype(str)
+    wide = onsets.pivot_table(index=['session', 'trial'], columns='column', values='t', aggfunc='first')
+
+    n_stopwords = int(onsets.loc[repeated, 'n'].max()) if repeated.any() else 0
+    columns = ['concept'] + ['stopword_' + str(k) for k in range(1, n_stopwords + 1)] \
+        + ['target', 'response', 'timeout']
+    wide = wide.reindex(columns=columns)
+    wide.columns = [name + '_onset' for name in columns]
+
+    trials = trials.copy()
+    trials['session'] = trials['session'].astype(str)
+    return trials.merge(wide.reset_index(), on=['session', 'trial'], how='left')
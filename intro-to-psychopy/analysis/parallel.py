@@ -0,0 +1,115 @@
+"""
+Run a per-subject analysis over all subjects on a pool of processes.
+
+Every cross-subject loop in the notebook reads and analyses one subject at a
+time on one core. map_reduce() maps a function over the subjects' file pairs
+(events file, rec file) with a multiprocessing.Pool, and merges the results
+as they come back with an associative combine function, so the result never
+depends on how the subjects were split up between the processes:
+
+    pairs = list(zip(all_events, all_recalls))
+    counts = map_reduce(subject_recall_counts, pairs, combine=add_tables, progress=True)
+
+The function has to be defined at the top level of a module (not in the
+notebook) so it can be sent to the worker processes, ie. the subject_*
+functions in analysis.like_dislike and analysis.recall_match.
+"""
+from __future__ import absolute_import, division, print_function
+import sys
+from collections import Counter
+from multiprocessing import Pool, cpu_count
+
+import pandas as pd
+
+
+def add_counters(a, b):
+    # Counter a + Counter b, keeping zero and negative counts
+    total = Counter(a)
+    total.update(b)
+    return total
+
+
+def add_tables(a, b):
+    # element-wise sum of two count tables (DataFrames or Series), aligned on their labels;
+    # both are filled out to the union of the labels first, so int counts stay int
+    # (a.add(b, fill_value=0) goes through NaN and returns floats)
+    labels = {'index': a.index.union(b.index)}
+    if isinstance(a, pd.DataFrame):
+        labels['columns'] = a.columns.union(b.columns)
+    return a.reindex(fill_value=0, **labels) + b.reindex(fill_value=0, **labels)
+
+
+def concat_frames(a, b):
+    # stack per-subject frames
+    return pd.concat([a, b])
+
+
+def default_combine(a, b):
+    # Counters are added, DataFrames stacked and numbers summed
+    if isinstance(a, Counter):
+        return add_counters(a, b)
+    if isinstance(a, pd.DataFrame):
+        return concat_frames(a, b)
+    return a + b
+
+
+def print_progress(done, total):
+    sys.stdout.write('\rsubject ' + str(done) + '/' + str(total))
+    if done == total:
+        sys.stdout.write('\n')
+    sys.stdout.flush()
+
+
+def default_chunksize(n_items, processes):
+    # about four chunks per process: big enough to cut down on messaging, small enough to balance the load
+    return max(1, n_items // (processes * 4))
+
+
+def map_subjects(function, items, processes=None, chunksize=None, progress=None):
+    """
+    Yield function(item) for every item, in order, computed on a pool of
+    `processes` workers (all cores by default; 1 runs everything in this process).
+    progress is called as progress(done, total) after every item; True prints a counter.
+    """
+    items = list(items)
+    total = len(items)
+    if progress is True:
+        progress = print_progress
+    processes = processes or cpu_count()
+    processes = min(processes, max(total, 1))
+
+    if processes == 1:
+        results = map(function, items)
+        pool = None
+    else:
+        pool = Pool(processes)
+        results = pool.imap(function, items, chunksize or default_chunksize(total, processes))
+    finished = False
+    try:
+        for done, result in enumerate(results, 1):
+            if progress:
+                progress(done, total)
+            yield result
+        finished = True
+    finally:
+        if pool is not None:
+            if finished:
+                pool.close()
+            else:
+                # stopped early (an exception, or the caller stopped iterating): don't wait for
+                # the workers to get through the remaining subjects
+                pool.terminate()
+            pool.join()
+
+
+def map_reduce(function, items, combine=default_combine, initial=None, processes=None, chunksize=None,
+               progress=None):
+    """
+    combine(...combine(combine(initial, function(item0)), function(item1))...)
+    with function computed in parallel (see map_subjects). combine has to be
+    associative. Returns initial (None by default) if there are no items.
+    """
+    result = initial
+    for value in map_subjects(function, items, processes, chunksize, progress):
+        result = value if result is None else combine(result, value)
+    return result
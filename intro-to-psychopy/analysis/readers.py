@@ -0,0 +1,79 @@
+"""
+Read only the columns we need from the events and rec csvs, with fixed types.
+
+pd.read_csv(e) parses every column of an events file as strings, although the
+analysis only uses types, resp, item and trialN. read_columns() reads just the
+requested columns (skipping the ones a file doesn't have) with the dtypes in
+EVENTS_DTYPES / RECALL_DTYPES: the repeated strings (types, resp, item) as
+categoricals, numbers as float64 (so missing values are allowed).
+
+Files bigger than memory_budget bytes are read in chunks sized to fit the
+budget; the chunks' categoricals are merged with union_categoricals, so the
+result is the same as reading the file in one go. iter_columns() gives the
+chunks one at a time for code that can work on a chunk at a time.
+"""
+from __future__ import absolute_import, division, print_function
+import os
+
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+EVENTS_DTYPES = {'types': 'category', 'resp': 'category', 'item': 'category', 'trialN': 'float64'}
+RECALL_DTYPES = {'item': 'category', 'trialN': 'float64', 'intrusion': 'float64'}
+MEMORY_BUDGET = 256 * 1024 * 1024
+
+
+def _usecols(path, dtypes):
+    header = pd.read_csv(path, nrows=0).columns
+    return [name for name in header if name in dtypes]
+
+
+def _rows_per_chunk(path, memory_budget, sample_bytes=1 << 16):
+    # rows that fit in the budget, from the average line length of the start of the file
+    with open(path, 'rb') as f:
+        sample = f.read(sample_bytes)
+    line_bytes = max(1, len(sample) // max(1, sample.count(b'\n')))
+    # parsed rows take a few times more memory than their text
+    return max(1000, memory_budget // (line_bytes * 4))
+
+
+def iter_columns(path, dtypes, memory_budget=MEMORY_BUDGET):
+    # the requested columns of path, a chunk of rows at a time
+    usecols = _usecols(path, dtypes)
+    reader = pd.read_csv(path, usecols=usecols, dtype=dict((name, dtypes[name]) for name in usecols),
+                         chunksize=_rows_per_chunk(path, memory_budget))
+    for chunk in reader:
+        yield chunk
+
+
+def empty_frame(dtypes):
+    # no rows, with the columns and dtypes of dtypes (a list of (name, dtype) pairs)
+    return pd.DataFrame(dict((name, pd.Series([], dtype=dtype)) for name, dtype in dtypes),
+                        columns=[name for name, dtype in dtypes])
+
+
+def concat_categorical(frames, dtypes=()):
+    """
+    pd.concat that keeps categorical columns categorical when the frames'
+    categories differ (plain concat turns them into object columns).
+    With no frames, an empty frame with the columns and dtypes of dtypes
+    (a list of (name, dtype) pairs).
+    """
+    frames = [frame for frame in frames]
+    if not frames:
+        return empty_frame(dtypes)
+    if len(frames) == 1:
+        return frames[0].reset_index(drop=True)
+    merged = pd.concat(frames, ignore_index=True)
+    for name in frames[0].columns:
+        if isinstance(frames[0][name].dtype, pd.CategoricalDtype):
+            merged[name] = union_categoricals([frame[name] for frame in frames])
+    return merged
+
+
+def read_columns(path, dtypes, memory_budget=MEMORY_BUDGET):
+    # the requested columns of path with their dtypes, in chunks if the file is bigger than memory_budget
+    if os.path.getsize(path) <= memory_budget:
+        usecols = _usecols(path, dtypes)
+        return pd.read_csv(path, usecols=usecols, dtype=dict((name, dtypes[name]) for name in usecols))
+    return concat_categorical(iter_columns(path, dtypes, memory_budget), list(dtypes.items()))
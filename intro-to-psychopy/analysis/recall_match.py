@@ -0,0 +1,96 @@
+"""
+Match recalls to study events: does liking an item lead to recalling it better?
+
+The notebook answers this by looping over every recall and, for each one,
+scanning every events row for the same item (and in its second version doing
+that inside a loop over every event), which is O(recalls x events) per subject.
+
+Here the recalls (without intrusions) are reduced to the set of
+(subject, item, trialN) keys and joined to the stim_pres events with one
+hash join (DataFrame.merge), so each study event is marked recalled or not in
+a single pass over all subjects:
+
+    events = read_events(all_events)          # analysis.like_dislike
+    recalls = read_recalls(all_recalls)
+    recall_counts(events, recalls)
+"""
+from __future__ import absolute_import, division, print_function
+import numpy as np
+import pandas as pd
+
+from analysis.like_dislike import DISLIKE_KEY, LIKE_KEY, RECALL_SUFFIX, read_events, stim_presentations, subject_id
+from analysis.readers import RECALL_DTYPES, concat_categorical, read_columns
+
+MATCH_KEYS = ['subject', 'item', 'trialN']
+
+
+def read_recalls(paths, columns=('item', 'trialN', 'intrusion')):
+    # rec files of all subjects as one DataFrame with categorical subject and item columns
+    dtypes = dict((name, RECALL_DTYPES.get(name, 'object')) for name in columns)
+    frames = []
+    for path in paths:
+        recalls = read_columns(path, dtypes)
+        recalls.insert(0, 'subject', pd.Categorical([subject_id(path, RECALL_SUFFIX)] * len(recalls)))
+        frames.append(recalls)
+    return concat_categorical(frames, [('subject', 'category')] + [(name, dtypes[name]) for name in columns])
+
+
+def recall_index(recalls):
+    # unique (subject, item, trialN) of the correct recalls
+    correct = recalls[(recalls['intrusion'] == 0).to_numpy()]
+    index = correct[MATCH_KEYS].drop_duplicates()
+    # the events' categoricals have different categories, join on plain strings
+    index = index.assign(subject=index['subject'].astype(str), item=index['item'].astype(object))
+    return index
+
+
+def classify_recalls(events, recalls):
+    """
+    The liked/disliked stim_pres events with two extra columns:
+    liked    -- True for 'period', False for 'slash'
+    recalled -- whether the item was recalled (not as an intrusion) in the same trial
+    """
+    stims = stim_presentations(events)
+    stims = stims[stims['resp'].isin([LIKE_KEY, DISLIKE_KEY]).to_numpy()]
+    stims = stims.assign(subject=stims['subject'].astype(str), item=stims['item'].astype(object),
+                         liked=(stims['resp'] == LIKE_KEY).to_numpy())
+    index = recall_index(recalls).assign(recalled=True)
+    # trialN can be read as int in one file and float in another, match on the same type
+    index['trialN'] = index['trialN'].astype(np.float64)
+    stims = stims.assign(trialN=stims['trialN'].astype(np.float64))
+    marked = stims.merge(index, on=MATCH_KEYS, how='left')
+    marked['recalled'] = marked['recalled'].fillna(False).astype(bool)
+    return marked
+
+
+def recall_counts(events, recalls, by_subject=False):
+    """
+    Number of liked/disliked items that were recalled or not, and the recall rate.
+    With by_subject=True there is one such table per subject (subject as the outer index).
+    """
+    marked = classify_recalls(events, recalls)
+    marked['like'] = np.where(marked['liked'].to_numpy(), 'liked', 'disliked')
+    keys = ['subject', 'like'] if by_subject else ['like']
+    counts = marked.groupby(keys)['recalled'].agg(['sum', 'size'])
+    table = pd.DataFrame({'recalled': counts['sum'].astype(np.int64),
+                          'not_recalled': (counts['size'] - counts['sum']).astype(np.int64)})
+    if not by_subject:
+        table = table.reindex(['liked', 'disliked']).fillna(0).astype(np.int64)
+    return add_recall_rate(table)
+
+
+def add_recall_rate(table):
+    # (re)compute recall_rate from the recalled and not_recalled counts, ie. after adding up subjects
+    table = table.copy()
+    table['recall_rate'] = table['recalled'] / (table['recalled'] + table['not_recalled'])
+    return table
+
+
+def subject_recall_counts(pair):
+    """
+    recall_counts (without recall_rate) of one subject's (events file, rec file) pair,
+    for analysis.parallel.map_reduce with combine=add_tables.
+    """
+    events_path, recall_path = pair
+    table = recall_counts(read_events([events_path]), read_recalls([recall_path]))
+    return table.drop(columns=['recall_rate'])
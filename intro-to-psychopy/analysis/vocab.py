@@ -0,0 +1,126 @@
+"""
+Item names as int32 codes, so counting is done on integer arrays.
+
+The same few hundred item names repeat in every subject's events file, and
+Counter(liked_items).most_common() hashes each of those strings one at a time.
+An ItemVocab maps the names to codes 0..len(vocab)-1 once (the hashing is done
+in pandas' C code), after which
+
+- count_codes() is one np.bincount over the codes
+- top_k() finds the k largest counts with np.argpartition and only sorts those
+- vocab.decode() turns the codes back into names at the end
+
+    vocab = ItemVocab.from_values(events['item'])
+    codes = vocab.encode(stims['item'])
+    counts = count_codes(codes, len(vocab))
+    [(vocab.names[code], counts[code]) for code in top_k(counts, 10)]
+
+Codes follow the order in which the names were added. encode() adds values
+that aren't in the vocabulary yet, so nothing goes uncounted; a fixed set of
+names (ie. the response keys) can instead raise on them or encode them as -1,
+like missing values, which are never counted.
+"""
+from __future__ import absolute_import, division, print_function
+import numpy as np
+import pandas as pd
+
+
+class ItemVocab(object):
+
+    def __init__(self, names=()):
+        self.names = []
+        self._index = pd.Index([], dtype=object)
+        self.extend(names)
+
+    @classmethod
+    def from_values(cls, values):
+        # vocabulary of the distinct values, in order of first appearance
+        return cls(pd.unique(pd.Series(values, dtype=object).dropna().to_numpy()))
+
+    def __len__(self):
+        return len(self.names)
+
+    def __repr__(self):
+        # the names in code order, so the repr is the same in every run (analysis.memo keys on it)
+        return 'ItemVocab(' + repr(self.names) + ')'
+
+    def extend(self, values):
+        # add the values that aren't in the vocabulary yet, keeping the codes of the old ones
+        values = pd.unique(pd.Series(values, dtype=object).dropna().to_numpy())
+        new = values[self._index.get_indexer(values) < 0] if len(self.names) else values
+        if len(new):
+            self.names.extend(new.tolist())
+            self._index = pd.Index(self.names, dtype=object)
+        return self
+
+    def encode(self, values, unknown='extend'):
+        """
+        int32 codes of values, -1 for missing values. Values that aren't in the
+        vocabulary are added to it (unknown='extend'), raise a KeyError
+        (unknown='error') or are encoded as -1 too (unknown='ignore').
+        """
+        if unknown not in ('extend', 'error', 'ignore'):
+            raise ValueError("unknown must be 'extend', 'error' or 'ignore', not " + repr(unknown))
+        if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+            # map the (few) categories, then index with the column's own codes
+            values = pd.Categorical(values)
+            names = values.categories
+        else:
+            values = pd.Index(np.asarray(values, dtype=object))
+            names = values
+        lookup = self._index.get_indexer(names)
+        if unknown != 'ignore' and (lookup < 0).any():
+            new = pd.Series(names[lookup < 0], dtype=object).dropna()
+            if len(new) and unknown == 'error':
+                raise KeyError('not in the vocabulary: ' + ', '.join(str(name) for name in new.unique()[:10]))
+            if len(new):
+                self.extend(new)
+                lookup = self._index.get_indexer(names)
+        lookup = lookup.astype(np.int32)
+        if names is values:
+            return lookup
+        return np.append(lookup, np.int32(-1))[values.codes]
+
+    def decode(self, codes):
+        return np.asarray(self.names, dtype=object)[np.asarray(codes)]
+
+
+def count_codes(codes, n):
+    # how often each of the codes 0..n-1 appears
+    codes = np.asarray(codes)
+    return np.bincount(codes[codes >= 0], minlength=n)
+
+
+def first_positions(codes, n):
+    # index of the first appearance of each code, len(codes) for codes that don't appear
+    codes = np.asarray(codes)
+    first = np.full(n, len(codes), dtype=np.int64)
+    present, positions = np.unique(codes, return_index=True)
+    keep = present >= 0
+    first[present[keep]] = positions[keep]
+    return first
+
+
+def top_k(counts, k=None, order=None):
+    """
+    Codes of the k largest non-zero counts, largest first. Ties are broken by
+    order (smaller first; defaults to the code), ie. first_positions() for
+    Counter.most_common's order of first appearance.
+    """
+    counts = np.asarray(counts)
+    if order is None:
+        order = np.arange(len(counts))
+    candidates = np.flatnonzero(counts > 0)
+    if k is not None and k < len(candidates):
+        # everything tied with the k-th largest count can still make the cut
+        kth = -np.partition(-counts[candidates], k - 1)[k - 1]
+        candidates = candidates[counts[candidates] >= kth]
+    ranked = candidates[np.lexsort((order[candidates], -counts[candidates]))]
+    return ranked if k is None else ranked[:k]
+
+
+def most_common_codes(codes, vocab, n=None):
+    # [(name, count), ...] like Counter(vocab.decode(codes)).most_common(n)
+    counts = count_codes(codes, len(vocab))
+    top = top_k(counts, n, first_positions(codes, len(vocab)))
+    return list(zip(vocab.decode(top).tolist(), counts[top].tolist()))
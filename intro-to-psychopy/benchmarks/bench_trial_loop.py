@@ -0,0 +1,260 @@
+"""
+Micro-benchmarks for the trial loop.
+
+Times the operations one trial is made of, one call at a time, on synthetic
+stimulus lists of 10, 1k and 100k rows:
+
+- the set 2/3 way of doing things: show_blank_screen, stimText.text = word,
+  draw(), win.logOnFlip + flip, event.getKeys polling and data.at writes
+  growing a DataFrame
+- the helpers: compile_timeline, TrialResults writes and play_trial
+
+Results are reported as percentiles in microseconds, and per-frame operations
+also as a share of the frame budget at 60/120/144 Hz. Flips don't wait for
+the screen here, so these are CPU costs only.
+
+By default everything runs on the headless backend (helpers/headless.py),
+which measures the Python overhead of our own code. --backend psychopy uses a
+real PsychoPy window (with waitBlanking off) instead, which includes text layout and drawing.
+
+Every run is saved to benchmarks/results/<git revision>.json and compared
+with the previous saved run, so regressions show up between revisions:
+
+    python benchmarks/bench_trial_loop.py
+    python benchmarks/bench_trial_loop.py --sizes 10 1000 --compare benchmarks/results/abc1234.json
+"""
+from __future__ import absolute_import, division, print_function
+import argparse
+import glob
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+rootDir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+resultsDir = os.path.join(rootDir, 'benchmarks', 'results')
+sys.path.insert(0, rootDir)
+
+REFRESH_RATES = (60, 120, 144)
+PERCENTILES = (50, 90, 99)
+# a result this much slower than the previous run is flagged
+REGRESSION_RATIO = 1.2
+
+WORDS = ['pepper', 'chair', 'trousers', 'balloon', 'scooter', 'seasoning', 'seat', 'material',
+         'coniferous', 'pan', 'window', 'river', 'bicycle', 'umbrella', 'elephant', 'violin']
+STOPWORDS = ['is a', 'has a', 'made of', 'a', 'is an', 'has']
+
+
+def synthetic_stim(n_rows, seed=0):
+    # stimulus DataFrame with the same columns as stimuli/sample_stimuli.csv
+    import pandas as pd
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n_rows):
+        rows.append((rng.choice(WORDS), rng.choice(STOPWORDS), rng.choice(WORDS),
+                     rng.uniform(-1, 1), rng.randint(1, 4), rng.choice(['period', 'slash'])))
+    return pd.DataFrame(rows, columns=['concept', 'stopword', 'target', 'cos', 'cond', 'corrAns'])
+
+
+def time_calls(function, args_list):
+    # seconds taken by each function(*args) call
+    times = np.empty(len(args_list))
+    perf_counter = time.perf_counter
+    for k, args in enumerate(args_list):
+        t0 = perf_counter()
+        function(*args)
+        times[k] = perf_counter() - t0
+    return times
+
+
+def summarize(times, per_frame=False):
+    result = {'n': int(len(times)), 'mean_us': float(np.mean(times) * 1e6)}
+    for p, value in zip(PERCENTILES, np.percentile(times, PERCENTILES)):
+        result['p' + str(p) + '_us'] = float(value * 1e6)
+    result['max_us'] = float(np.max(times) * 1e6)
+    if per_frame:
+        # share of one refresh interval used by the 99th percentile call
+        for rate in REFRESH_RATES:
+            result['budget_' + str(rate) + 'hz_pct'] = float(result['p99_us'] / (1e6 / rate) * 100)
+    return result
+
+
+def sample_rows(n_rows, max_samples, rng):
+    if n_rows <= max_samples:
+        return list(range(n_rows))
+    return sorted(rng.sample(range(n_rows), max_samples))
+
+
+def run_size(n_rows, max_samples, backend):
+    from psychopy import visual, event, core, logging
+    from helpers.timeline import compile_timeline
+    from helpers.results import TrialResults
+    from helpers.player import play_trial
+    from helpers.text_cache import TextStimCache
+    from helpers.keyboard import ResponseKeyboard
+    import pandas as pd
+
+    rng = random.Random(n_rows)
+    stim = synthetic_stim(n_rows)
+    rows = sample_rows(n_rows, max_samples, rng)
+    words = [stim['concept'][i] for i in rows]
+
+    if backend == 'psychopy':
+        win = visual.Window([800, 800], fullscr=False, waitBlanking=False, units='cm')
+    else:
+        win = visual.Window([800, 800], fullscr=False, units='cm')
+    stimText = visual.TextStim(win=win, text="", font='Arial', height=0.9, units='cm')
+    logging.root.toLog = []
+
+    def show_blank_screen(frameN):
+        stimText.text = " "
+        for frameN in range(0, frameN):
+            stimText.draw()
+            win.flip()
+
+    def set_text(word):
+        stimText.text = word
+
+    def log_and_flip(word):
+        win.logOnFlip('start concept word: ' + word, level=logging.DATA)
+        win.flip()
+
+    keypress_rt = core.Clock()
+
+    def get_keys():
+        event.getKeys(keyList=['period', 'slash'], modifiers=False, timeStamped=keypress_rt)
+
+    def dataframe_at(data, i, item):
+        data.at[i, 'resp'] = 'period'
+        data.at[i, 'rt'] = 0.5
+        data.at[i, 'item'] = item
+        data.at[i, 'globaltime'] = 1.0
+
+    data_columns = ['item', 'resp', 'rt', 'globaltime']
+    results = {}
+    results['show_blank_screen_30'] = summarize(time_calls(show_blank_screen, [(30,)] * min(len(rows), 200)))
+    results['text_assign'] = summarize(time_calls(set_text, [(w,) for w in words]), per_frame=True)
+    results['draw'] = summarize(time_calls(stimText.draw, [()] * len(rows)), per_frame=True)
+    results['flip'] = summarize(time_calls(win.flip, [()] * len(rows)), per_frame=True)
+    results['logOnFlip_flip'] = summarize(time_calls(log_and_flip, [(w,) for w in words]), per_frame=True)
+    logging.root.toLog = []
+    results['getKeys'] = summarize(time_calls(get_keys, [()] * len(rows)), per_frame=True)
+
+    # data.at on a DataFrame that already holds n_rows - 1 rows, so every write grows it
+    data = pd.DataFrame(index=range(max(n_rows - 1, 0)), columns=data_columns)
+    results['dataframe_at_grow'] = summarize(time_calls(
+        dataframe_at, [(data, n_rows - 1 + k, words[k]) for k in range(min(len(rows), 200))]))
+
+    store = TrialResults(n_rows, [('item', object), ('resp', 'category'), ('rt', np.float64),
+                                  ('globaltime', np.float64)], categories={'resp': ['period', 'slash']})
+    results['trial_results_at'] = summarize(time_calls(
+        dataframe_at, [(store, i, words[k]) for k, i in enumerate(rows)]))
+
+    t0 = time.perf_counter()
+    timeline = compile_timeline(stim)
+    elapsed = time.perf_counter() - t0
+    results['compile_timeline'] = {'n': 1, 'total_ms': elapsed * 1e3, 'per_row_us': elapsed / n_rows * 1e6}
+
+    cache = TextStimCache(win, font='Arial', height=0.9, units='cm')
+    cache.warm(timeline.texts, draw=False)
+    kb = ResponseKeyboard(['period', 'slash'])
+    trials = rows[:min(len(rows), 200)]
+    # the compiled frame counts are played as they are, since the per-frame times below divide by them
+    # (and the psychopy window doesn't wait for the blank, so there are no flip times to compensate with)
+    trial_times = time_calls(lambda i: play_trial(win, timeline, i, cache, kb, compensate=False),
+                             [(i,) for i in trials])
+    logging.root.toLog = []
+    results['play_trial'] = summarize(trial_times)
+    frames = np.array([timeline.n_frames(i) for i in trials], dtype=np.float64)
+    results['play_trial_per_frame'] = summarize(trial_times / frames, per_frame=True)
+    hold_times = time_calls(lambda i: play_trial(win, timeline, i, cache, kb, compensate=False, hold=True),
+                            [(i,) for i in trials])
+    logging.root.toLog = []
+    results['play_hold_per_frame'] = summarize(hold_times / frames, per_frame=True)
+
+    win.close()
+    return results
+
+
+def git_revision():
+    try:
+        rev = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=rootDir)
+        dirty = subprocess.check_output(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=rootDir)
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return rev.decode().strip() + ('-dirty' if dirty.strip() else '')
+
+
+def previous_results(path, backend):
+    # most recently saved results file of the same backend other than path
+    files = [f for f in glob.glob(os.path.join(resultsDir, '*_' + backend + '.json'))
+             if os.path.abspath(f) != os.path.abspath(path)]
+    if not files:
+        return None
+    return max(files, key=os.path.getmtime)
+
+
+def print_results(report, baseline=None):
+    for size, ops in sorted(report['sizes'].items(), key=lambda item: int(item[0])):
+        print('\n' + size + ' rows')
+        for op, stats in ops.items():
+            line = '  {:<22}'.format(op)
+            if 'p50_us' in stats:
+                line += ' p50 {:>9.2f}  p90 {:>9.2f}  p99 {:>9.2f}  max {:>9.2f} us'.format(
+                    stats['p50_us'], stats['p90_us'], stats['p99_us'], stats['max_us'])
+                key = 'p50_us'
+            else:
+                line += ' total {:>9.2f} ms  per row {:>7.2f} us'.format(stats['total_ms'], stats['per_row_us'])
+                key = 'per_row_us'
+            if 'budget_60hz_pct' in stats:
+                line += '  budget ' + ' '.join('{}Hz {:.2f}%'.format(rate, stats['budget_' + str(rate) + 'hz_pct'])
+                                               for rate in REFRESH_RATES)
+            old = (baseline or {}).get('sizes', {}).get(size, {}).get(op)
+            if old and old.get(key):
+                ratio = stats[key] / old[key]
+                line += '  x{:.2f} vs {}'.format(ratio, baseline['revision'])
+                if ratio > REGRESSION_RATIO:
+                    line += '  SLOWER'
+            print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for the trial loop.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 100000])
+    parser.add_argument('--max-samples', type=int, default=2000, help='calls timed per operation')
+    parser.add_argument('--backend', choices=['headless', 'psychopy'], default='headless')
+    parser.add_argument('--compare', default=None, help='results file to compare with (default: the previous run)')
+    parser.add_argument('--no-save', action='store_true')
+    args = parser.parse_args(argv)
+
+    if args.backend == 'headless':
+        from helpers import headless
+        headless.install()
+
+    report = {'revision': git_revision(), 'backend': args.backend, 'python': sys.version.split()[0],
+              'time': time.strftime('%Y-%m-%d %H:%M:%S'), 'sizes': {}}
+    for n_rows in args.sizes:
+        report['sizes'][str(n_rows)] = run_size(n_rows, args.max_samples, args.backend)
+
+    path = os.path.join(resultsDir, report['revision'] + '_' + args.backend + '.json')
+    baseline_path = args.compare or previous_results(path, args.backend)
+    baseline = None
+    if baseline_path:
+        with open(baseline_path) as f:
+            baseline = json.load(f)
+    print_results(report, baseline)
+
+    if not args.no_save:
+        if not os.path.isdir(resultsDir):
+            os.makedirs(resultsDir)
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=1)
+        print('\nsaved ' + os.path.relpath(path, rootDir))
+
+
+if __name__ == '__main__':
+    main()
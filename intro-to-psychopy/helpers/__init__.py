@@ -0,0 +1,6 @@
+"""
+Helper modules shared by the intro-to-psychopy example sets.
+
+The set scripts add the intro-to-psychopy root to sys.path and then import
+what they need, ie. `from helpers.timeline import compile_timeline`
+"""
@@ -0,0 +1,104 @@
+"""
+Log file target for psychopy.logging that writes to disk on a background thread.
+
+With a psychopy logging.LogFile, every logging.flush() writes to the file (and
+flushes it) on the thread that is drawing the trials. AsyncLogFile takes its
+place: logging.flush() only formats the records and hands them to
+AsyncLogFile.write(), which puts them on a queue and returns straight away.
+A writer thread picks up everything that is queued every `interval` seconds
+and writes it to the file in one go.
+
+The queue is a collections.deque, whose append/popleft don't need a lock,
+so the drawing thread never waits on the writer. It holds at most maxsize
+chunks (psychopy's logging.flush() writes one per log record); chunks that
+don't fit are counted in .dropped and reported in the file instead of blocking.
+
+Everything queued is written when close() is called, and close() is also
+registered to run when the interpreter exits (ie. on core.quit()).
+"""
+from __future__ import absolute_import, division, print_function
+import atexit
+import io
+import os
+import threading
+import time
+from collections import deque
+from psychopy import logging
+
+
+class _QueuedStream(object):
+    # logging.flush() calls target.stream.flush() after writing; the writer thread does the real flushing
+
+    def flush(self):
+        pass
+
+
+class AsyncLogFile(object):
+
+    def __init__(self, f, level=logging.WARNING, filemode='a', logger=None, encoding='utf8',
+                 interval=0.05, maxsize=100000, fsync=False):
+        # same arguments as logging.LogFile, plus how often and how carefully to write
+        self.name = f
+        self.level = level
+        self.interval = interval
+        self.maxsize = maxsize
+        self.fsync = fsync
+        self.dropped = 0
+        self._queue = deque()
+        self._closed = False
+        self.stream = _QueuedStream()
+        self._stream = io.open(f, filemode, encoding=encoding)
+        self._thread = threading.Thread(target=self._run, name='AsyncLogFile')
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+        self._logger = logger or logging.root
+        self._logger.addTarget(self)
+
+    def setLevel(self, level):
+        self.level = level
+        self._logger._calcLowestTarget()
+
+    def write(self, txt):
+        # called by logging.flush() on the drawing thread, must not block
+        if self._closed:
+            return
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            return
+        self._queue.append(txt)
+
+    def _drain(self):
+        chunks = []
+        queue = self._queue
+        while queue:
+            chunks.append(queue.popleft())
+        if self.dropped:
+            chunks.append(str(self.dropped) + ' log chunks dropped, the log queue was full\n')
+            self.dropped = 0
+        if chunks:
+            self._stream.write(u''.join(chunks))
+            self._stream.flush()
+            if self.fsync:
+                os.fsync(self._stream.fileno())
+
+    def _run(self):
+        while not self._closed:
+            time.sleep(self.interval)
+            self._drain()
+
+    def close(self):
+        # write out everything that is still queued and close the file
+        if self._closed:
+            return
+        # hand over whatever psychopy.logging has not flushed yet
+        self._logger.flush()
+        self._closed = True
+        self._thread.join()
+        self._drain()
+        self._stream.close()
+        try:
+            self._logger.removeTarget(self)
+        except ValueError:
+            pass
@@ -0,0 +1,140 @@
+"""
+Write trial data to disk as the session goes, so a crash doesn't lose it.
+
+Every finished trial is appended to a partial csv in batches of batch_size
+rows. Each batch is flushed and (unless fsync=False) forced onto the disk
+before the next trial starts, which is while the blank screen at the end of
+the trial is still showing, never in the middle of a word.
+
+If a session crashes, read_partial() reads back the trials that made it to
+the partial file so the experiment can pick up at the first missing trial.
+A half-written last line (from a crash in the middle of a write) is dropped.
+A new session that doesn't resume never writes over a partial file that has
+trials in it: the old file is renamed to ..._partial_<date>-<time>.csv first.
+"""
+from __future__ import absolute_import, division, print_function
+import csv
+import io
+import os
+import time
+
+
+def partial_path(data_file):
+    # sample_beh_001.csv -> sample_beh_001_partial.csv
+    root, ext = os.path.splitext(data_file)
+    return root + '_partial' + ext
+
+
+def read_partial(path, columns):
+    """
+    Read the complete rows of a partial data file.
+    Returns a list of rows (lists of strings), empty if the file doesn't exist.
+    Raises ValueError if the file was written with different columns.
+    """
+    if not os.path.exists(path):
+        return []
+    with io.open(path, 'r', newline='') as f:
+        text = f.read()
+    # anything after the last newline is a row that was cut off
+    if not text.endswith('\n'):
+        text = text[:text.rfind('\n') + 1]
+    rows = list(csv.reader(io.StringIO(text)))
+    if not rows:
+        return []
+    if rows[0] != list(columns):
+        raise ValueError(path + ' has columns ' + str(rows[0]) + ', expected ' + str(list(columns)))
+    return [row for row in rows[1:] if len(row) == len(columns)]
+
+
+def keep_partial(path):
+    """
+    Rename the partial file at path to path with the current date and time
+    added (ie. sample_beh_001_partial_20240131-142502.csv) if it has any
+    trials in it, so a new session can start without losing them.
+    Returns the new path, or None if there was nothing to keep.
+    """
+    if not os.path.exists(path):
+        return None
+    with io.open(path, 'r', newline='') as f:
+        f.readline()
+        has_rows = bool(f.readline())
+    if not has_rows:
+        return None
+    root, ext = os.path.splitext(path)
+    stamp = root + '_' + time.strftime('%Y%m%d-%H%M%S')
+    new_path = stamp + ext
+    n = 1
+    while os.path.exists(new_path):
+        n += 1
+        new_path = stamp + '-' + str(n) + ext
+    os.rename(path, new_path)
+    return new_path
+
+
+class IncrementalWriter(object):
+
+    def __init__(self, path, columns, batch_size=1, fsync=True, resume_rows=None):
+        """
+        path        -- partial csv file to write to
+        columns     -- column names, written as the header
+        batch_size  -- number of trials to collect before writing them out
+        fsync       -- force every batch onto the disk, not just into the OS cache
+        resume_rows -- rows read back with read_partial; the file is rewritten
+                       with just these rows so a cut-off last line is removed.
+                       Without them (None), a partial file already at path is
+                       kept under another name (see keep_partial), whose path
+                       is in kept_path
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.batch_size = batch_size
+        self.fsync = fsync
+        self._pending = []
+        self.kept_path = None
+        if resume_rows is None:
+            self.kept_path = keep_partial(path)
+        # the header (and resumed rows) go to a temporary file that replaces the old one in one step,
+        # so the rows we are resuming from are never lost halfway through
+        tmp_path = path + '.tmp'
+        self._file = io.open(tmp_path, 'w', newline='')
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(self.columns)
+        if resume_rows:
+            self._writer.writerows(resume_rows)
+        self._sync()
+        self._file.close()
+        os.replace(tmp_path, path)
+        self._file = io.open(path, 'a', newline='')
+        self._writer = csv.writer(self._file)
+
+    def append(self, row):
+        # add one trial, writing the batch out once it is full
+        self._pending.append(row)
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._writer.writerows(self._pending)
+            self._pending = []
+        self._sync()
+
+    def _sync(self):
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self, remove=False):
+        # write out what is left; remove=True deletes the partial file once the full data is saved elsewhere
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+        if remove:
+            os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
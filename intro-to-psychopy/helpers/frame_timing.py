@@ -0,0 +1,120 @@
+"""
+Record the time of every win.flip() and count dropped frames per trial.
+
+The frame loops assume each flip takes exactly one refresh. FlipRecorder keeps
+the timestamp returned by every flip, together with the segment kind that was
+on the screen (see helpers/timeline.py), in a preallocated ring buffer.
+At the end of a trial trial_stats() works out when the trial actually
+started, how long it actually took and how many refreshes were missed, and
+segment_stats() compares each segment's requested and achieved duration.
+
+Durations are given in milliseconds and turned into frames with the refresh
+period measured on the window (measure_frame_period, ms_to_frames), so the
+same settings give the same timing at 60, 120 or 144 Hz.
+"""
+from __future__ import absolute_import, division, print_function
+import numpy as np
+
+# flips longer than this many frame periods count as dropped frames
+DROP_THRESHOLD = 1.5
+
+
+def measure_frame_period(win, default_rate=60.0):
+    # seconds per refresh of win, assuming default_rate if it can't be measured
+    frame_rate = win.getActualFrameRate()
+    if frame_rate is None:
+        frame_rate = default_rate
+    return 1.0 / frame_rate
+
+
+def ms_to_frames(ms, frame_period):
+    # closest number of refreshes to ms milliseconds, at least one
+    return max(1, int(round(ms / 1000.0 / frame_period)))
+
+
+class FlipRecorder(object):
+
+    def __init__(self, frame_period, size=1 << 16):
+        # size has to be larger than the number of flips of the longest trial
+        self.frame_period = frame_period
+        self.size = size
+        self.times = np.zeros(size, dtype=np.float64)
+        self.kinds = np.zeros(size, dtype=np.int8)
+        self.n = 0  # total number of flips recorded so far
+        self._trial_start = 0
+        # flip index, kind and requested duration (ms) of each segment of the trial
+        self._segments = []
+
+    def record(self, t, kind):
+        # called right after each win.flip() with the time it returned
+        idx = self.n % self.size
+        self.times[idx] = t
+        self.kinds[idx] = kind
+        self.n += 1
+
+    def start_trial(self):
+        self._trial_start = self.n
+        self._segments = []
+
+    def start_segment(self, kind, requested):
+        # called right before the first flip of a segment
+        self._segments.append((self.n, kind, requested))
+
+    def trial_flips(self):
+        # (times, kinds) of the flips since start_trial, oldest first
+        start, stop = self._trial_start, self.n
+        if stop - start > self.size:
+            raise ValueError('trial has ' + str(stop - start) + ' flips, more than the ring buffer size '
+                             + str(self.size))
+        i, j = start % self.size, stop % self.size
+        if i <= j and stop - start < self.size:
+            return self.times[i:j], self.kinds[i:j]
+        idx = np.arange(start, stop) % self.size
+        return self.times[idx], self.kinds[idx]
+
+    def trial_stats(self):
+        """
+        Timing of the flips since start_trial:
+        n_flips  -- number of flips
+        onset    -- time of the first flip
+        duration -- time from the first flip to the end of the last frame
+        dropped  -- number of refreshes missed between flips
+        requested -- sum of the requested durations of the segments (in s, NaN if none were started)
+        """
+        times, kinds = self.trial_flips()
+        requested = sum(segment[2] for segment in self._segments) / 1000.0 if self._segments else np.nan
+        if len(times) == 0:
+            return {'n_flips': 0, 'onset': np.nan, 'duration': np.nan, 'dropped': 0, 'requested': requested}
+        intervals = np.diff(times) / self.frame_period
+        late = intervals[intervals > DROP_THRESHOLD]
+        dropped = int(np.rint(late).sum() - len(late))
+        return {
+            'n_flips': len(times),
+            'onset': float(times[0]),
+            'duration': float(times[-1] - times[0] + self.frame_period),
+            'dropped': dropped,
+            'requested': requested,
+        }
+
+    def segment_stats(self):
+        """
+        [{kind, requested, achieved, n_flips}, ...] for each segment of the trial,
+        with requested and achieved durations in ms. A segment lasts from its
+        first flip to the first flip of the next one (or one frame after its last flip).
+        """
+        times, kinds = self.trial_flips()
+        stats = []
+        for j in range(len(self._segments)):
+            start, kind, requested = self._segments[j]
+            stop = self._segments[j + 1][0] if j + 1 < len(self._segments) else self.n
+            first, last = start - self._trial_start, stop - self._trial_start
+            if last <= first:
+                continue
+            if stop < self.n:
+                end = times[last]
+            else:
+                end = times[last - 1] + self.frame_period
+            stats.append({'kind': kind, 'requested': requested,
+                          'achieved': float(end - times[first]) * 1000.0, 'n_flips': last - first})
+        return stats
+
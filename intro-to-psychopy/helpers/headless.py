@@ -0,0 +1,475 @@
+"""
+Headless stand-in for PsychoPy, for running the example scripts without a display.
+
+install() puts replacement psychopy, psychopy.core/visual/event/gui/logging and
+psychopy.hardware.keyboard modules into sys.modules, so an unchanged script
+that does `from psychopy import visual, event, gui, core, logging` gets these:
+
+- Window does not draw anything. Every flip() moves a virtual clock on by one
+  frame period instead of waiting for the screen, so a session runs as fast
+  as Python can go. core.Clock, core.getTime and core.wait use the same clock.
+  It does keep track of the texts drawn into its two buffers, which flip()
+  swaps like a real window, so win.onScreen is what the last flip showed.
+- Key presses come from ScriptedKeys: a list of responses (or random ones)
+  handed out one per response window through event.getKeys/event.waitKeys
+  and hardware.keyboard.Keyboard.
+- gui.Dlg does not pop up, it returns the initial values of its fields
+  (or the ones given in gui_values) and OK is always True.
+- logging writes log files in the same format as psychopy.logging.
+
+It can also be run directly, from the intro-to-psychopy folder:
+
+    python helpers/headless.py set3/gui_and_logging.py --responses period,slash,none --field SubjID=999
+
+core.quit() raises SystemExit as usual, which the runner catches.
+"""
+from __future__ import absolute_import, division, print_function
+import argparse
+import io
+import os
+import random
+import runpy
+import sys
+import time
+import types
+
+
+class VirtualTime(object):
+    # the one clock everything in the headless backend runs on
+
+    def __init__(self):
+        self.now = 0.0
+
+    def advance(self, secs):
+        self.now += secs
+
+
+class ScriptedKeys(object):
+    """
+    Source of scripted key presses.
+    responses -- list of (key, rt) pairs, one per response window, used in order;
+                 key None means no response. After the list runs out (or without one),
+                 a random key from the requested key list is pressed after a random rt
+                 in rt_range, with a probability of `miss` for no response.
+    hold      -- how long every key is held down
+    """
+
+    def __init__(self, responses=None, rt_range=(0.2, 0.8), miss=0.0, hold=0.1,
+                 wait_rt=0.5, seed=None):
+        self.responses = list(responses or [])
+        self.rt_range = rt_range
+        self.miss = miss
+        self.hold = hold
+        self.wait_rt = wait_rt
+        self.random = random.Random(seed)
+        self.n_used = 0
+
+    def next_response(self, key_list=None):
+        # (key, rt) for the next response window
+        if self.n_used < len(self.responses):
+            response = self.responses[self.n_used]
+        elif self.random.random() < self.miss:
+            response = (None, 0.0)
+        else:
+            keys = key_list or ['space']
+            response = (self.random.choice(keys), self.random.uniform(*self.rt_range))
+        self.n_used += 1
+        return response
+
+
+# core
+#-----------------------------------------------------------------------#
+def _make_core(vtime):
+    core = types.ModuleType('psychopy.core')
+
+    class Clock(object):
+        def __init__(self):
+            self._start = vtime.now
+
+        def getTime(self, applyZero=True):
+            return vtime.now - self._start
+
+        def reset(self, newT=0.0):
+            self._start = vtime.now + newT
+
+        def add(self, t):
+            self._start += t
+
+    def getTime():
+        return vtime.now
+
+    def wait(secs, hogCPUperiod=0.2):
+        vtime.advance(secs)
+
+    def quit():
+        sys.modules['psychopy.logging'].flush()
+        raise SystemExit(0)
+
+    core.Clock = Clock
+    core.MonotonicClock = Clock
+    core.getTime = getTime
+    core.wait = wait
+    core.quit = quit
+    return core
+
+
+# logging
+#-----------------------------------------------------------------------#
+def _make_logging(core):
+    logging = types.ModuleType('psychopy.logging')
+    levels = [('CRITICAL', 50), ('ERROR', 40), ('WARNING', 30), ('DATA', 25),
+              ('EXP', 22), ('INFO', 20), ('DEBUG', 10), ('NOTSET', 0)]
+    names = {}
+    for name, value in levels:
+        setattr(logging, name, value)
+        names[value] = name
+    logging.defaultClock = core.Clock()
+
+    class _Logger(object):
+        format = u'{t:.4f} \t{levelname} \t{message}\n'
+
+        def __init__(self):
+            self.targets = []
+            self.toLog = []
+            self.lowestTarget = 50
+
+        def addTarget(self, target):
+            self.targets.append(target)
+            self._calcLowestTarget()
+
+        def removeTarget(self, target):
+            self.targets.remove(target)
+            self._calcLowestTarget()
+
+        def _calcLowestTarget(self):
+            self.lowestTarget = min([target.level for target in self.targets] + [50])
+
+        def log(self, message, level, t=None, obj=None):
+            if level < self.lowestTarget:
+                return
+            if t is None:
+                t = logging.defaultClock.getTime()
+            self.toLog.append((t, level, message))
+
+        def flush(self):
+            # like psychopy: one write() per record and target, then target.stream.flush()
+            for target in self.targets:
+                for t, level, message in self.toLog:
+                    if level >= target.level:
+                        target.write(self.format.format(t=t, levelname=names.get(level, str(level)),
+                                                        message=message))
+                target.stream.flush()
+            self.toLog = []
+
+    class LogFile(object):
+        def __init__(self, f=None, level=logging.WARNING, filemode='a', logger=None, encoding='utf8'):
+            self.level = level
+            self._logger = logger or logging.root
+            self.stream = sys.stdout if f is None else io.open(f, filemode, encoding=encoding)
+            self._logger.addTarget(self)
+
+        def setLevel(self, level):
+            self.level = level
+            self._logger._calcLowestTarget()
+
+        def write(self, txt):
+            self.stream.write(txt)
+
+    logging.root = _Logger()
+    logging.LogFile = LogFile
+    logging.console = LogFile(level=logging.WARNING)
+    logging.flush = logging.root.flush
+
+    def setDefaultClock(clock):
+        logging.defaultClock = clock
+
+    def log(msg, level, t=None, obj=None):
+        logging.root.log(msg, level, t, obj)
+
+    logging.setDefaultClock = setDefaultClock
+    logging.log = log
+    for name, value in levels[:-1]:
+        setattr(logging, name.lower(), (lambda value: lambda msg, t=None, obj=None: log(msg, value, t, obj))(value))
+    logging.warn = logging.warning
+    return logging
+
+
+# visual
+#-----------------------------------------------------------------------#
+def _make_visual(vtime, logging, frame_rate):
+    visual = types.ModuleType('psychopy.visual')
+
+    class Window(object):
+        def __init__(self, size=(800, 600), fullscr=False, units=None, color=(0, 0, 0), **kwargs):
+            self.size = size
+            self.fullscr = fullscr
+            self.units = units
+            self.color = color
+            self.monitorFramePeriod = 1.0 / frame_rate
+            self.frameIntervals = []
+            self.nFlips = 0
+            self.nDraws = 0
+            # texts drawn into the back buffer since it was last cleared, and what the last flip put on
+            # the screen; like a real window, flip() swaps the two, so with clearBuffer=False the next
+            # frame is drawn over what was shown two flips ago
+            self.backBuffer = []
+            self.onScreen = []
+            self._toCall = []
+            self._toLog = []
+
+        def flip(self, clearBuffer=True):
+            # like psychopy, the flip time is taken from the logging clock
+            vtime.advance(self.monitorFramePeriod)
+            t = logging.defaultClock.getTime()
+            self.nFlips += 1
+            self.onScreen, self.backBuffer = self.backBuffer, self.onScreen
+            if clearBuffer:
+                self.backBuffer = []
+            else:
+                self.backBuffer = list(self.backBuffer)
+            if self._toCall:
+                for function, args, kwargs in self._toCall:
+                    function(*args, **kwargs)
+                self._toCall = []
+            if self._toLog:
+                for msg, level, obj in self._toLog:
+                    logging.root.log(msg, level, t=t, obj=obj)
+                self._toLog = []
+            return t
+
+        def callOnFlip(self, function, *args, **kwargs):
+            self._toCall.append((function, args, kwargs))
+
+        def logOnFlip(self, msg, level, obj=None):
+            self._toLog.append((msg, level, obj))
+
+        def timeOnFlip(self, obj, attrib):
+            self.callOnFlip(setattr, obj, attrib, vtime.now + self.monitorFramePeriod)
+
+        def getActualFrameRate(self, nIdentical=10, nMaxFrames=100, nWarmUpFrames=10, threshold=1):
+            return frame_rate
+
+        def clearBuffer(self, color=True, depth=False, stencil=False):
+            self.backBuffer = []
+
+        def close(self):
+            pass
+
+    class TextStim(object):
+        def __init__(self, win, text='', **kwargs):
+            self.win = win
+            self.text = text
+            for key, value in kwargs.items():
+                setattr(self, key, value)
+
+        def setText(self, text, log=None):
+            self.text = text
+
+        def draw(self, win=None):
+            win = win or self.win
+            win.nDraws += 1
+            win.backBuffer.append(self.text)
+
+    visual.Window = Window
+    visual.TextStim = TextStim
+    return visual
+
+
+# event and hardware.keyboard
+#-----------------------------------------------------------------------#
+def _make_event(vtime, keys):
+    event = types.ModuleType('psychopy.event')
+    state = {'pending': None}
+
+    def clearEvents(eventType=None):
+        # a new response window: arm the next scripted response
+        key, rt = keys.next_response()
+        state['pending'] = None if key is None else (key, vtime.now + rt)
+
+    def getKeys(keyList=None, modifiers=False, timeStamped=False):
+        pending = state['pending']
+        if pending is None or vtime.now < pending[1]:
+            return []
+        key = pending[0]
+        if keyList and key not in keyList:
+            # the scripted key doesn't fit this call, pick one that does
+            key = keyList[0]
+        state['pending'] = None
+        if timeStamped:
+            return [(key, timeStamped.getTime())]
+        return [key]
+
+    def waitKeys(maxWait=float('inf'), keyList=None, modifiers=False, timeStamped=False, clearEvents=True):
+        vtime.advance(min(keys.wait_rt, maxWait))
+        key = keyList[0] if keyList else 'space'
+        if timeStamped:
+            return [(key, timeStamped.getTime())]
+        return [key]
+
+    event.clearEvents = clearEvents
+    event.getKeys = getKeys
+    event.waitKeys = waitKeys
+    return event
+
+
+def _make_keyboard(vtime, core, keys):
+    keyboard = types.ModuleType('psychopy.hardware.keyboard')
+
+    class KeyPress(object):
+        def __init__(self, name, tDown, rt):
+            self.name = name
+            self.tDown = tDown
+            self.rt = rt
+            self.duration = None
+
+    class Keyboard(object):
+        def __init__(self, backend=None, **kwargs):
+            self.clock = core.Clock()
+            self._scripted = None
+            self._armed_at = None
+
+        def clearEvents(self, eventType=None):
+            self._scripted = None
+            self._armed_at = vtime.now
+
+        def getKeys(self, keyList=None, waitRelease=True, clear=True):
+            if self._armed_at is None or self.clock._start < self._armed_at:
+                # the clock hasn't been reset at the response window's flip yet
+                return []
+            if self._scripted is None:
+                key, rt = keys.next_response(keyList)
+                self._scripted = [] if key is None else [(key, rt)]
+            now = self.clock.getTime()
+            found = []
+            for key, rt in self._scripted:
+                if now < rt or (keyList and key not in keyList):
+                    continue
+                released = now >= rt + keys.hold
+                if waitRelease and not released:
+                    continue
+                press = KeyPress(key, self.clock._start + rt, rt)
+                if released:
+                    press.duration = keys.hold
+                found.append(press)
+            if clear and found:
+                self._scripted = [k for k in self._scripted if k[0] not in [p.name for p in found]]
+            return found
+
+    keyboard.KeyPress = KeyPress
+    keyboard.Keyboard = Keyboard
+    return keyboard
+
+
+# gui
+#-----------------------------------------------------------------------#
+def _make_gui(gui_values):
+    gui = types.ModuleType('psychopy.gui')
+
+    class Dlg(object):
+        def __init__(self, title='', **kwargs):
+            self.title = title
+            self.labels = []
+            self.data = []
+            self.OK = False
+
+        def addField(self, label='', initial='', color='', choices=None, tip='', **kwargs):
+            self.labels.append(label)
+            key = label.rstrip(':').strip()
+            if key in gui_values:
+                initial = gui_values[key]
+            elif choices:
+                initial = initial or choices[0]
+            self.data.append(initial)
+
+        def addFixedField(self, label='', initial='', color='', choices=None, tip='', **kwargs):
+            self.labels.append(label)
+            self.data.append(initial)
+
+        def addText(self, text, color='', **kwargs):
+            pass
+
+        def show(self):
+            self.OK = True
+            return self.data
+
+    gui.Dlg = Dlg
+    return gui
+
+
+def install(frame_rate=60.0, keys=None, gui_values=None):
+    """
+    Replace psychopy in sys.modules with the headless backend.
+    Returns the VirtualTime everything runs on and the ScriptedKeys in use.
+    """
+    vtime = VirtualTime()
+    keys = keys or ScriptedKeys()
+    # gui fields given as strings, ie. from the command line
+    gui_values = dict(gui_values or {})
+
+    psychopy = types.ModuleType('psychopy')
+    psychopy.__path__ = []
+    hardware = types.ModuleType('psychopy.hardware')
+    hardware.__path__ = []
+
+    core = _make_core(vtime)
+    logging = _make_logging(core)
+    modules = {
+        'psychopy': psychopy,
+        'psychopy.core': core,
+        'psychopy.logging': logging,
+        'psychopy.visual': _make_visual(vtime, logging, frame_rate),
+        'psychopy.event': _make_event(vtime, keys),
+        'psychopy.gui': _make_gui(gui_values),
+        'psychopy.hardware': hardware,
+        'psychopy.hardware.keyboard': _make_keyboard(vtime, core, keys),
+    }
+    for name, module in modules.items():
+        sys.modules[name] = module
+        if name.count('.') == 1:
+            setattr(psychopy, name.split('.')[1], module)
+    hardware.keyboard = modules['psychopy.hardware.keyboard']
+    return vtime, keys
+
+
+def parse_responses(text):
+    # 'period,slash:0.3,none' -> [('period', 0.5), ('slash', 0.3), (None, 0.0)]
+    responses = []
+    for item in text.split(','):
+        key, _, rt = item.partition(':')
+        if key == 'none':
+            responses.append((None, 0.0))
+        else:
+            responses.append((key, float(rt) if rt else 0.5))
+    return responses
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run an example script without a display.')
+    parser.add_argument('script')
+    parser.add_argument('--frame-rate', type=float, default=60.0)
+    parser.add_argument('--responses', default='',
+                        help="comma separated key[:rt] per response window, 'none' for no response")
+    parser.add_argument('--miss', type=float, default=0.0, help='chance of no response once --responses run out')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--field', action='append', default=[], help='gui field value as label=value')
+    args = parser.parse_args(argv)
+
+    gui_values = dict(field.split('=', 1) for field in args.field)
+    if gui_values.get('resume') in ('True', 'False'):
+        gui_values['resume'] = gui_values['resume'] == 'True'
+    keys = ScriptedKeys(parse_responses(args.responses) if args.responses else None,
+                        miss=args.miss, seed=args.seed)
+    vtime, keys = install(args.frame_rate, keys, gui_values)
+
+    start = time.time()
+    try:
+        runpy.run_path(os.path.abspath(args.script), run_name='__main__')
+    except SystemExit as e:
+        if e.code not in (None, 0):
+            raise
+    print('headless run: ' + str(round(vtime.now, 3)) + ' s of experiment time in '
+          + str(round(time.time() - start, 3)) + ' s')
+
+
+if __name__ == '__main__':
+    main()
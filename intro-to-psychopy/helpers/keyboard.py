@@ -0,0 +1,55 @@
+"""
+Response keyboard with event-time, flip-referenced response times.
+
+event.getKeys(timeStamped=clock) stamps a key with the time it was polled,
+which is once per frame, and the clock was started some time before the
+'True or False?' text actually appeared. ResponseKeyboard uses
+psychopy.hardware.keyboard instead: with the psychtoolbox backend a
+background thread stamps every key down and key up the moment it happens,
+and the keyboard clock is reset by win.callOnFlip, ie. right at the flip
+that puts the response window on the screen. RTs are therefore measured
+from the actual onset and are not rounded to frames.
+(Without psychtoolbox installed, psychopy falls back to polling.)
+
+Every key down/up in key_list during the trial is kept, not only the first.
+"""
+from __future__ import absolute_import, division, print_function
+from psychopy.hardware import keyboard
+
+
+class ResponseKeyboard(object):
+
+    def __init__(self, key_list, backend=None):
+        self.key_list = list(key_list)
+        if backend is None:
+            self.kb = keyboard.Keyboard()
+        else:
+            self.kb = keyboard.Keyboard(backend=backend)
+
+    def start(self, win):
+        # call before the first flip of the response window: keys pressed before that
+        # flip are thrown away and rt = 0 is the moment it happens
+        win.callOnFlip(self.kb.clearEvents)
+        win.callOnFlip(self.kb.clock.reset)
+
+    def _keys(self, clear):
+        # a key stamped before the onset flip (still in the buffer when it was cleared) isn't a response
+        keys = self.kb.getKeys(keyList=self.key_list, waitRelease=False, clear=clear)
+        return [key for key in keys if key.rt >= 0]
+
+    def poll(self):
+        # (key, rt) of the first key pressed since start(), or None
+        # keys are left in the buffer so their release time can still be collected by finish()
+        keys = self._keys(clear=False)
+        if keys:
+            return keys[0].name, keys[0].rt
+        return None
+
+    def finish(self):
+        """
+        All key events since start() as a list of (key, rt, duration) tuples.
+        rt is the key down and rt + duration the key up time, relative to the
+        response window onset; duration is None if the key is still held down.
+        """
+        keys = self._keys(clear=True)
+        return [(key.name, key.rt, key.duration) for key in keys]
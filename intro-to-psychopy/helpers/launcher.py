@@ -0,0 +1,138 @@
+"""
+Start experiment sessions from a python process that has already imported PsychoPy.
+
+Every session script spends seconds importing psychopy.visual, gui, core, ...
+before the first dialog shows up. The launcher does those imports once and
+then waits; each time the experimenter presses Enter it forks a copy of
+itself, which runs the script as __main__ with everything already imported.
+The copy opens its own dialog and window and quits as usual (core.quit() only
+ends the copy), and the launcher is right away ready for the next subject:
+
+    python helpers/launcher.py set3/gui_and_logging.py
+
+Only imports are done ahead of time, no window or dialog is opened before
+forking, so every session starts from a fresh state. pandas isn't preloaded
+unless asked for with --preload pandas, the sessions only import it when
+saving the data at the end.
+
+The project root is found once here and passed to the sessions in the
+INTRO_PSYCHOPY_ROOT environment variable, so the scripts don't have to look
+for it again. Sessions are only forked on Linux; on macOS and Windows every
+session is a new python process, which still saves the root lookup but not
+the imports.
+"""
+from __future__ import absolute_import, division, print_function
+import argparse
+import atexit
+import importlib
+import os
+import runpy
+import subprocess
+import sys
+import time
+import traceback
+
+ROOT_ENV = 'INTRO_PSYCHOPY_ROOT'
+ROOT_NAME = 'intro-to-psychopy'
+DEFAULT_PRELOAD = ['numpy', 'psychopy.core', 'psychopy.logging', 'psychopy.visual',
+                   'psychopy.event', 'psychopy.gui', 'psychopy.hardware.keyboard']
+
+
+def find_root(start=None):
+    # the intro-to-psychopy folder start (default: the current folder) is in
+    path = os.path.abspath(start or os.getcwd())
+    while os.path.basename(path) != ROOT_NAME:
+        parent = os.path.dirname(path)
+        if parent == path:
+            raise ValueError('not inside the ' + ROOT_NAME + ' folder: ' + str(start or os.getcwd()))
+        path = parent
+    return path
+
+
+def preload(modules):
+    # import the modules, returns how long that took
+    start = time.time()
+    for name in modules:
+        importlib.import_module(name)
+    return time.time() - start
+
+
+def _run_child(script, script_args, root):
+    # runs in the forked copy and never returns
+    code = 0
+    try:
+        os.chdir(root)
+        sys.argv = [script] + list(script_args)
+        runpy.run_path(script, run_name='__main__')
+    except SystemExit as e:
+        code = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    # end like a normal python process (atexit handlers run, eg. AsyncLogFile.close)
+    # without unwinding back into the launcher's loop
+    try:
+        atexit._run_exitfuncs()
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+        os._exit(code)
+
+
+def start_session(script, script_args, root):
+    # run one session of script and return its exit code
+    script = os.path.abspath(script)
+    if not sys.platform.startswith('linux'):
+        # fork without exec isn't safe on macOS (the system frameworks psychopy's imports
+        # load don't survive it) and doesn't exist on Windows
+        return subprocess.call([sys.executable, script] + list(script_args), cwd=root)
+    sys.stdout.flush()
+    sys.stderr.flush()
+    pid = os.fork()
+    if pid == 0:
+        _run_child(script, script_args, root)
+    status = os.waitpid(pid, 0)[1]
+    if os.WIFSIGNALED(status):
+        return -os.WTERMSIG(status)
+    return os.WEXITSTATUS(status)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Preload PsychoPy once and start sessions of a script from it.')
+    parser.add_argument('script')
+    parser.add_argument('script_args', nargs=argparse.REMAINDER)
+    parser.add_argument('--preload', action='append', default=[], help='extra module to import ahead of time')
+    parser.add_argument('--headless', action='store_true', help='use the fake psychopy of helpers/headless.py')
+    parser.add_argument('--field', action='append', default=[], help='gui field value as label=value (with --headless)')
+    args = parser.parse_args(argv)
+
+    root = find_root(os.path.dirname(os.path.abspath(args.script)))
+    os.environ[ROOT_ENV] = root
+    if root not in sys.path:
+        sys.path.insert(0, root)
+
+    if args.headless:
+        from helpers.headless import install
+        gui_values = dict(field.split('=', 1) for field in args.field)
+        install(gui_values=gui_values)
+    seconds = preload(DEFAULT_PRELOAD + args.preload)
+    print('preloaded in ' + str(round(seconds, 2)) + ' s')
+
+    n_sessions = 0
+    while True:
+        try:
+            answer = input('Press Enter to start session ' + str(n_sessions + 1) + ' of '
+                           + os.path.basename(args.script) + ' (q to quit): ')
+        except EOFError:
+            break
+        if answer.strip().lower() in ('q', 'quit'):
+            break
+        start = time.time()
+        code = start_session(args.script, args.script_args, root)
+        n_sessions += 1
+        print('session ' + str(n_sessions) + ' ended with code ' + str(code)
+              + ' after ' + str(round(time.time() - start, 1)) + ' s')
+
+
+if __name__ == '__main__':
+    main()
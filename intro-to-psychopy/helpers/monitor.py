@@ -0,0 +1,262 @@
+"""
+Experimenter monitor: shows the progress of a running session from another process.
+
+Printing 'Showing sentence ...' and 'Pressed: ...' from the trial loop puts
+console output on the thread that draws the trials, and a slow or paused
+terminal can hold it up. Instead the experiment hands its trial events to a
+MonitorClient, which works like helpers/async_log.py: send() only appends to
+a deque, and a background thread sends what was queued every `interval`
+seconds as UDP datagrams to 127.0.0.1. Nothing waits for the monitor to read
+them, and if no monitor is running the events are simply lost.
+
+The monitor is a separate process that prints a line per trial with the
+running accuracy (against the stimulus file's corrAns), mean RT, missed
+responses and dropped frames. Those numbers are kept by the experiment in a
+SessionStats (helpers/session_loop.py adds every trial to it) and sent in
+full with every trial event, so the monitor only shows them and a lost
+datagram doesn't throw them off:
+
+    python helpers/monitor.py               # in a second terminal, or
+    start_monitor()                         # from the experiment script
+
+Every trial event carries the session name, number of trials and the
+session's numbers so far, so a monitor started in the middle of a session
+picks up from there. A monitor
+started with start_monitor() is stopped when the experiment exits, and also
+quits by itself once the experiment's process is gone (ie. after it was
+killed), so it never keeps holding the port.
+"""
+from __future__ import absolute_import, division, print_function
+import argparse
+import atexit
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 50505
+MAX_DATAGRAM = 65507
+PARENT_CHECK = 1.0  # s between checks that the experiment that started the monitor is still running
+END_WAIT = 1.0  # s a monitor started with exit_after_session gets to show the session's end at exit
+
+
+def _plain(value):
+    # numpy scalars and anything else json doesn't know
+    return value.item() if hasattr(value, 'item') else str(value)
+
+
+class MonitorClient(object):
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT, interval=0.05, maxsize=10000):
+        self.address = (host, port)
+        self.interval = interval
+        self.maxsize = maxsize
+        self.dropped = 0  # events that didn't fit in the queue
+        self.lost = 0  # events the socket couldn't send
+        self._queue = deque()
+        self._closed = False
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._sock.setblocking(False)
+        self._thread = threading.Thread(target=self._run, name='MonitorClient')
+        self._thread.daemon = True
+        self._thread.start()
+        atexit.register(self.close)
+
+    def send(self, event, **fields):
+        # called from the trial loop, must not block
+        if self._closed:
+            return
+        if len(self._queue) >= self.maxsize:
+            self.dropped += 1
+            return
+        self._queue.append((event, fields))
+
+    def _drain(self):
+        queue = self._queue
+        while queue:
+            event, fields = queue.popleft()
+            fields['event'] = event
+            data = json.dumps(fields, default=_plain).encode('utf8')
+            try:
+                self._sock.sendto(data[:MAX_DATAGRAM], self.address)
+            except (IOError, OSError):
+                # socket buffer full, or nobody listening
+                self.lost += 1
+
+    def _run(self):
+        while not self._closed:
+            time.sleep(self.interval)
+            self._drain()
+
+    def close(self):
+        # send everything that is still queued
+        if self._closed:
+            return
+        self._closed = True
+        self._thread.join()
+        self._drain()
+        self._sock.close()
+
+
+def _stop_monitor(process, wait=0.0):
+    # give a monitor that quits after the session a moment to show its end, then stop it
+    try:
+        process.wait(wait)
+    except subprocess.TimeoutExpired:
+        process.terminate()
+        process.wait()
+
+
+def _listening(host, port):
+    # whether something is bound to the port (our test bind fails)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.bind((host, port))
+    except (IOError, OSError):
+        return True
+    finally:
+        sock.close()
+    return False
+
+
+def start_monitor(port=DEFAULT_PORT, exit_after_session=True, timeout=5.0):
+    """
+    Run the monitor in its own python process, sharing this terminal, until
+    this one exits. Waits (at most timeout seconds) until the monitor listens,
+    since events sent before that are lost.
+    """
+    args = [sys.executable, os.path.abspath(__file__), '--port', str(port), '--parent', str(os.getpid())]
+    if exit_after_session:
+        args.append('--exit-after-session')
+    process = subprocess.Popen(args)
+    atexit.register(_stop_monitor, process, END_WAIT if exit_after_session else 0.0)
+    deadline = time.time() + timeout
+    # (if the monitor quits right away, ie. another one has the port, there's nothing to wait for)
+    while process.poll() is None and not _listening(DEFAULT_HOST, port) and time.time() < deadline:
+        time.sleep(0.02)
+    return process
+
+
+class SessionStats(object):
+    # running numbers of one session, kept by the experiment and sent with every trial event
+
+    def __init__(self):
+        self.n_done = 0
+        self.n_resp = 0
+        self.n_scored = 0
+        self.n_correct = 0
+        self.rt_sum = 0.0
+        self.dropped = 0
+
+    def add(self, resp, rt, corr_ans=None, dropped=0):
+        self.n_done += 1
+        self.dropped += int(dropped or 0)
+        if resp is None:
+            return
+        self.n_resp += 1
+        self.rt_sum += float(rt or 0.0)
+        if corr_ans is not None:
+            self.n_scored += 1
+            self.n_correct += resp == corr_ans
+
+    def fields(self):
+        return {'n_done': self.n_done, 'n_resp': self.n_resp, 'n_scored': self.n_scored,
+                'n_correct': self.n_correct, 'rt_sum': self.rt_sum, 'dropped': self.dropped}
+
+
+def format_stats(stats):
+    # stats: SessionStats.fields(), as sent in the trial and end events
+    if not stats:
+        return '-'
+    accuracy = (str(round(100.0 * stats['n_correct'] / stats['n_scored'], 1)) + '%'
+                if stats['n_scored'] else '-')
+    mean_rt = str(round(stats['rt_sum'] / stats['n_resp'], 3)) + ' s' if stats['n_resp'] else '-'
+    return ('acc ' + accuracy + '  mean rt ' + mean_rt + '  no resp ' + str(stats['n_done'] - stats['n_resp'])
+            + '  dropped ' + str(stats['dropped']) + ' frames')
+
+
+def format_trial(trial):
+    resp = trial.get('resp')
+    if resp is None:
+        answer = 'no response'
+    else:
+        answer = str(resp) + ' in ' + str(round(trial.get('rt') or 0.0, 3)) + ' s'
+        if trial.get('corr_ans') is not None:
+            answer += ' (correct)' if resp == trial['corr_ans'] else ' (wrong)'
+    timing = ''
+    if trial.get('duration') is not None and trial.get('requested') is not None:
+        timing = '  ' + str(round(trial['duration'], 3)) + '/' + str(round(trial['requested'], 3)) + ' s'
+    if trial.get('dropped'):
+        timing += '  DROPPED ' + str(trial['dropped'])
+    return (trial['session'] + '  trial ' + str(trial['trial'] + 1) + '/' + str(trial['n_trials'])
+            + '  ' + str(trial.get('item', '')) + ': ' + answer + timing + '  | ' + format_stats(trial.get('stats')))
+
+
+def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, exit_after_session=False, out=None, parent=None):
+    # parent: pid of the experiment that started the monitor, which quits when that process is gone
+    out = out or sys.stdout
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.bind((host, port))
+    except (IOError, OSError) as e:
+        sock.close()
+        raise ValueError('cannot listen on ' + host + ':' + str(port) + ' (' + str(e)
+                         + '), is another monitor still running?')
+    if parent is not None:
+        sock.settimeout(PARENT_CHECK)
+    try:
+        while True:
+            try:
+                data, sender = sock.recvfrom(MAX_DATAGRAM)
+            except socket.timeout:
+                if os.getppid() != parent:
+                    break
+                continue
+            try:
+                message = json.loads(data.decode('utf8'))
+                event = message['event']
+                session = message['session']
+            except (ValueError, KeyError):
+                continue
+            if event == 'session':
+                out.write('-- ' + session + ': ' + str(message.get('n_trials')) + ' trials'
+                          + (', starting at trial ' + str(message['start'] + 1) if message.get('start') else '')
+                          + '\n')
+            elif event == 'trial_start':
+                out.write(session + '  showing ' + str(message['trial'] + 1) + '/' + str(message['n_trials'])
+                          + ': ' + str(message.get('item', '')) + '\n')
+            elif event == 'trial':
+                out.write(format_trial(message) + '\n')
+            elif event == 'end':
+                stats = message.get('stats') or {}
+                out.write('-- ' + session + ' done: ' + str(stats.get('n_done', '?')) + ' trials, '
+                          + format_stats(stats) + '\n')
+            out.flush()
+            if event == 'end' and exit_after_session:
+                break
+    finally:
+        sock.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Show the trials of running sessions as they happen.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--exit-after-session', action='store_true', help='quit when a session ends')
+    parser.add_argument('--parent', type=int, help='quit when the process with this pid is gone')
+    args = parser.parse_args(argv)
+    try:
+        serve(args.host, args.port, args.exit_after_session, parent=args.parent)
+    except ValueError as e:
+        parser.exit(1, 'monitor: ' + str(e) + '\n')
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+"""
+Play a compiled Timeline (see helpers/timeline.py) on a PsychoPy window.
+
+Everything about a trial is worked out by compile_timeline, so the frame loops
+below only draw, flip and, during the response window, poll the keyboard.
+
+The text of a segment doesn't change while it is held, so with hold=True it is
+only drawn on the first HOLD_DRAWS frames of the segment (clearing the buffer
+before each of those draws, since a flip with clearBuffer=False leaves the
+frame before the last one in it) and the remaining frames are flipped with
+clearBuffer=False, which presents what is already in the buffers. The flips
+(and so the timing, logOnFlip and callOnFlip) are the same either way.
+
+hold=True is off by default: it relies on the driver keeping exactly two
+buffers that swap on every flip, but OpenGL leaves the back buffer undefined
+after a swap, and with triple buffering, copy-swap or a compositor the held
+frames can show a blank screen or the previous word. Only turn it on for a
+machine where it was checked to show every word correctly (ie. with a photodiode).
+"""
+from __future__ import absolute_import, division, print_function
+from builtins import range
+from psychopy import logging
+
+# assuming the window swaps between two buffers, a segment is drawn into both
+# before the flips alone can keep showing it
+HOLD_DRAWS = 2
+
+
+def _no_record(t, kind):
+    pass
+
+
+def _no_idle():
+    pass
+
+
+def play_trial(win, timeline, i, text_stims, keyboard, log_level=logging.DATA, recorder=None, compensate=True,
+               hold=False, idle=None):
+    """
+    Show every segment of trial i, taking the stim for each text from
+    text_stims (a helpers.text_cache.TextStimCache).
+    If recorder (a helpers.frame_timing.FlipRecorder) is given, the time of
+    every flip is recorded with the kind of segment that was shown, and the
+    start and requested duration of every segment.
+    keyboard (a helpers.keyboard.ResponseKeyboard) is started on the first
+    flip of the response window and polled on every frame of it.
+    With compensate, each segment is held until its requested end counted from
+    the trial's first flip (the time returned by win.flip(), ie. globalClock),
+    so frames lost to a dropped flip or to rounding durations to frames are
+    made up in the next segment instead of adding up over the trial. The
+    anchor is set again at every trial's first flip, so time lost between
+    trials (saving the data, etc.) is not made up. A window made with
+    waitBlanking=False returns None from flip(); the trial is then played
+    with the compiled frame counts.
+    With hold, each segment is drawn HOLD_DRAWS times and then only flipped.
+    idle (ie. helpers.prefetch.TrialPrefetcher.idle) is called after every
+    flip except the first one of a segment, to do a little work between frames.
+    Returns (resp, rt, key_events): the first key pressed during the response
+    window, or (None, None) if it timed out, and every key down/up of the
+    trial from keyboard.finish().
+    """
+    texts = timeline.texts
+    log_msgs = timeline.log_msgs
+    frame_period = timeline.frame_period
+    resp = None
+    rt = None
+    onset = None
+    end = 0.0  # requested time from the trial's first flip to the end of the current segment, in s
+    # frames of a segment on which the text is drawn, and whether flips clear the buffer
+    redraw = HOLD_DRAWS if hold else None
+    clear = not hold
+    record = _no_record
+    if idle is None:
+        idle = _no_idle
+    if recorder is not None:
+        recorder.start_trial()
+        record = recorder.record
+
+    for trial, kind, text_id, frames, duration, log_id, response, timeout_only in timeline.trial(i):
+        if timeout_only and resp is not None:
+            continue
+        text_stim = text_stims.get(texts[text_id])
+        if log_id >= 0:
+            win.logOnFlip(log_msgs[log_id], level=log_level)
+        if response:
+            # keypresses made before the response window are cleared out,
+            # and rt is measured from the first flip of the response window
+            keyboard.start(win)
+
+        # the first flip of the segment tells how far ahead or behind the trial is
+        if recorder is not None:
+            recorder.start_segment(kind, duration)
+        if hold:
+            # the buffer still has the previous segment in it
+            win.clearBuffer()
+        text_stim.draw()
+        t = win.flip(clearBuffer=clear)
+        record(t, kind)
+        if onset is None:
+            onset = t
+            # no flip times to compensate with (waitBlanking=False)
+            compensate = compensate and t is not None
+        end += duration / 1000.0
+        if compensate:
+            frames = max(1, int(round((onset + end - t) / frame_period)))
+
+        n_draws = frames if redraw is None else redraw
+        if not response:
+            for frameN in range(1, frames):
+                if frameN < n_draws:
+                    if hold:
+                        # this buffer still has the frame from two flips ago in it
+                        win.clearBuffer()
+                    text_stim.draw()
+                record(win.flip(clearBuffer=clear), kind)
+                idle()
+            continue
+
+        respKey = keyboard.poll()
+        if respKey is not None:
+            resp, rt = respKey
+        for frameN in range(1, frames):
+            if frameN < n_draws:
+                if hold:
+                    win.clearBuffer()
+                text_stim.draw()
+            record(win.flip(clearBuffer=clear), kind)
+            if resp is None:
+                respKey = keyboard.poll()
+                if respKey is not None:
+                    resp, rt = respKey
+            idle()
+
+    return resp, rt, keyboard.finish()
@@ -0,0 +1,73 @@
+"""
+Get the text stims of the next trials ready while the current trial is running.
+
+TextStimCache.warm() builds every word before the session starts, but only up
+to the cache size; with a long stimulus file the words further down are built
+by TextStimCache.get() on the first frame they are shown, which makes that
+frame late. TrialPrefetcher works a few trials ahead instead: play_trial calls
+idle() after the flips that don't start a segment, ie. while words, blanks and
+the response window are held on the screen, and each call takes the next text
+of the upcoming trials (at most `depth` ahead of the current one) and builds
+its stim if it isn't cached, or else marks it as recently used so the cache
+doesn't drop it before its trial. The stims have to be built on the thread
+that draws (they belong to the window's OpenGL context), so all of this runs
+between frames on that thread, one text at a time.
+
+    prefetcher = TrialPrefetcher(timeline, stimTexts, start=0, depth=2)
+    for i in range(len(timeline)):
+        prefetcher.ready(i)
+        play_trial(win, timeline, i, stimTexts, respKeyboard, idle=prefetcher.idle)
+    prefetcher.close()
+
+ready(i) builds whatever trial i still misses (nothing, if idle() got to it).
+"""
+from __future__ import absolute_import, division, print_function
+from collections import deque
+
+import numpy as np
+
+
+class TrialPrefetcher(object):
+
+    def __init__(self, timeline, text_stims, start=0, depth=2):
+        self.timeline = timeline
+        self.text_stims = text_stims
+        self.depth = depth
+        self.built = 0  # stims that idle() built ahead of their trial
+        self.current = start  # trial being played, set by ready()
+        self._next_trial = start + 1  # next trial whose texts idle() takes on
+        self._pending = deque()  # texts of the trial idle() is on, still to be built
+
+    def trial_texts(self, i):
+        # distinct texts shown in trial i, in order of appearance
+        timeline = self.timeline
+        text_ids = timeline.segments['text_id'][timeline.trial_start[i]:timeline.trial_start[i + 1]]
+        ids, first = np.unique(text_ids, return_index=True)
+        return [timeline.texts[text_id] for text_id in ids[np.argsort(first)]]
+
+    def idle(self):
+        # get at most one stim of an upcoming trial ready, called between flips on the drawing thread
+        if not self._pending:
+            # stay within depth trials of the current one, or the new stims push the near ones out of the cache
+            if self._next_trial > self.current + self.depth or self._next_trial >= len(self.timeline):
+                return
+            self._pending.extend(self.trial_texts(self._next_trial))
+            self._next_trial += 1
+        text = self._pending.popleft()
+        if not self.text_stims.cached(text):
+            self.built += 1
+        self.text_stims.get(text)
+
+    def ready(self, i):
+        # make sure every text of trial i has a stim before the trial starts
+        self.current = i
+        if self._next_trial <= i:
+            # idle() fell behind (or trials were skipped): carry on after this one
+            self._next_trial = i + 1
+            self._pending.clear()
+        for text in self.trial_texts(i):
+            if not self.text_stims.cached(text):
+                self.text_stims.get(text)
+
+    def close(self):
+        self._pending.clear()
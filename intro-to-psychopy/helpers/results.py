@@ -0,0 +1,104 @@
+"""
+Preallocated store for the trial data.
+
+Growing a DataFrame with data.at[i, ...] reallocates it every time a new row
+is added, and writing '[]' for a timeout turns the rt column into strings.
+TrialResults keeps one typed numpy array per column, sized for the whole
+session up front, and only builds the DataFrame when the data is saved.
+It supports the same data.at[i, 'column'] = value assignments.
+
+Categorical columns (ie. resp) are stored as small integer codes into a fixed
+list of labels. Missing values are NaN for float columns and -1 for
+categorical codes, which both come out as empty cells in the csv.
+"""
+from __future__ import absolute_import, division, print_function
+import numpy as np
+
+
+class TrialResults(object):
+
+    def __init__(self, n_trials, columns, categories=None):
+        """
+        n_trials   -- number of rows, ie. len(stim)
+        columns    -- list of (name, dtype) pairs, in the order they are saved
+        categories -- {name: list of labels} for the categorical columns
+        """
+        categories = categories or {}
+        self.n_trials = n_trials
+        self.columns = [name for name, dtype in columns]
+        self.categories = dict((name, list(labels)) for name, labels in categories.items())
+        self._codes = dict((name, dict((label, code) for code, label in enumerate(labels)))
+                           for name, labels in self.categories.items())
+        self._arrays = {}
+        for name, dtype in columns:
+            if name in self.categories:
+                self._arrays[name] = np.full(n_trials, -1, dtype=np.int16)
+                continue
+            dtype = np.dtype(dtype)
+            if dtype.kind == 'f':
+                self._arrays[name] = np.full(n_trials, np.nan, dtype=dtype)
+            elif dtype.kind == 'O':
+                self._arrays[name] = np.full(n_trials, None, dtype=dtype)
+            else:
+                self._arrays[name] = np.zeros(n_trials, dtype=dtype)
+
+    def __len__(self):
+        return self.n_trials
+
+    @property
+    def at(self):
+        # lets the experiment code keep writing data.at[i, 'rt'] = rt
+        return self
+
+    def __setitem__(self, key, value):
+        i, name = key
+        codes = self._codes.get(name)
+        if codes is not None:
+            value = -1 if value is None else codes[value]
+        self._arrays[name][i] = value
+
+    def __getitem__(self, key):
+        i, name = key
+        value = self._arrays[name][i]
+        if name in self.categories:
+            return None if value < 0 else self.categories[name][value]
+        return value
+
+    def row(self, i):
+        # values of trial i in column order, with missing values as ''
+        values = []
+        for name in self.columns:
+            value = self[i, name]
+            if value is None or (isinstance(value, float) and np.isnan(value)):
+                value = ''
+            values.append(value)
+        return values
+
+    def load_row(self, i, values):
+        # fill trial i from a row of strings read back from a saved csv
+        for name, value in zip(self.columns, values):
+            array = self._arrays[name]
+            if name in self.categories:
+                self[i, name] = value if value != '' else None
+            elif array.dtype.kind == 'f':
+                array[i] = float(value) if value != '' else np.nan
+            elif array.dtype.kind in 'iub':
+                array[i] = int(value) if value != '' else 0
+            else:
+                array[i] = value if value != '' else None
+
+    def column(self, name):
+        # the raw array behind a column (codes for categorical columns)
+        return self._arrays[name]
+
+    def to_dataframe(self, n_rows=None):
+        # build the DataFrame of the first n_rows trials (all of them by default)
+        import pandas as pd
+        n_rows = self.n_trials if n_rows is None else n_rows
+        frame = {}
+        for name in self.columns:
+            values = self._arrays[name][:n_rows]
+            if name in self.categories:
+                values = pd.Categorical.from_codes(values, categories=self.categories[name])
+            frame[name] = values
+        return pd.DataFrame(frame, columns=self.columns)
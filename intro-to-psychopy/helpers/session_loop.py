@@ -0,0 +1,127 @@
+"""
+The trial loop of the set 3 experiment, shared by set3/gui_and_logging.py and helpers/sessions.py.
+
+For every trial from `start` on, run_trials() plays it (helpers/player.py),
+fills in its row of the results (response, key events, timing), logs the
+keys and segment timing, appends the row to the partial data file and sends
+the trial to the experimenter monitor:
+
+    data, writer, start = open_results(data_file, timeline, [trueKey, falseKey], resume=resume)
+    run_trials(win, timeline, stimTexts, respKeyboard, flipRecorder, data, writer, globalClock,
+               start=start, corr_ans=stim['corrAns'], monitor=monitor, session=exp_summary)
+
+The monitor's running accuracy, RT and dropped frames are counted here, in a
+helpers.monitor.SessionStats, and sent with every trial and with the 'end'
+event after the last trial. Saving the full data file, closing the log file
+and the monitor are left to the caller.
+"""
+from __future__ import absolute_import, division, print_function
+from builtins import range
+
+import numpy as np
+from psychopy import logging
+
+from helpers.data_writer import IncrementalWriter, partial_path, read_partial
+from helpers.monitor import SessionStats
+from helpers.player import play_trial
+from helpers.prefetch import TrialPrefetcher
+from helpers.results import TrialResults
+from helpers.timeline import SEGMENT_NAMES
+
+# resp can only be one of the response keys, and stays empty (like rt) when there was no response
+DATA_COLUMNS = [('item', object), ('resp', 'category'), ('rt', np.float64), ('resp_duration', np.float64),
+                ('n_keys', np.int32), ('globaltime', np.float64),
+                ('onset', np.float64), ('duration', np.float64), ('requested', np.float64),
+                ('n_flips', np.int32), ('dropped', np.int32)]
+INTRO_TEXT = ("In this study, you will be seeing a sentence or a phrase, presented word by word. "
+              "\n\nPress the spacebar to begin.")
+ENDING_TEXT = "You are done with the experiment!"
+
+
+def _no_send(event, **fields):
+    pass
+
+
+def open_results(data_file, timeline, keys, save_every=1, resume=False):
+    """
+    (data, writer, start): the TrialResults of the session, the IncrementalWriter
+    of data_file's partial file and the first trial still to run. With resume,
+    the trials already in the partial file are read back into data and the
+    session starts after them; without, an earlier partial file is renamed
+    out of the way (see helpers.data_writer.keep_partial), never written over.
+    """
+    column_names = [name for name, dtype in DATA_COLUMNS]
+    data = TrialResults(len(timeline), DATA_COLUMNS, categories={'resp': list(keys)})
+    done_rows = read_partial(partial_path(data_file), column_names) if resume else []
+    for i in range(len(done_rows)):
+        if done_rows[i][0] != timeline.items[i]:
+            raise ValueError('partial data does not match the stimulus file at trial ' + str(i))
+        data.load_row(i, done_rows[i])
+    writer = IncrementalWriter(partial_path(data_file), column_names, batch_size=save_every,
+                               resume_rows=done_rows if resume else None)
+    if writer.kept_path is not None:
+        # a crashed session of the same subject that wasn't resumed: its trials are kept, not written over
+        print('kept the earlier partial data as ' + writer.kept_path + ' (tick resume to continue it instead)')
+    return data, writer, len(done_rows)
+
+
+def run_trials(win, timeline, text_stims, keyboard, recorder, data, writer, clock, start=0, corr_ans=None,
+               hold=False, prefetch_depth=2, monitor=None, session=''):
+    """
+    Play trials start..len(timeline)-1 and record them in data and writer.
+    clock is the session's clock (globaltime), corr_ans the stimulus file's
+    correct answers for the monitor, and monitor a helpers.monitor.MonitorClient
+    (None to send nothing). hold is play_trial's hold mode, off unless checked
+    to work on this machine (see helpers/player.py).
+    """
+    send = monitor.send if monitor is not None else _no_send
+    n_trials = len(timeline)
+    # words that didn't fit in the text stim cache are built a few trials ahead (see helpers/prefetch.py)
+    prefetcher = TrialPrefetcher(timeline, text_stims, start=start, depth=prefetch_depth)
+    send('session', session=session, n_trials=n_trials, start=start)
+    # trials read back from the partial file when resuming count too
+    stats = SessionStats()
+    for i in range(start):
+        stats.add(data[i, 'resp'], data[i, 'rt'], None if corr_ans is None else corr_ans[i], data[i, 'dropped'])
+    try:
+        for i in range(start, n_trials):
+            send('trial_start', session=session, trial=i, n_trials=n_trials, item=timeline.items[i])
+            prefetcher.ready(i)
+            resp, rt, key_events = play_trial(win, timeline, i, text_stims, keyboard, recorder=recorder,
+                                              hold=hold, idle=prefetcher.idle)
+            if resp is not None:
+                data.at[i, 'resp'] = resp
+                data.at[i, 'rt'] = rt
+
+            # every key down and up is logged; n_keys counts the response keys pressed from the response
+            # window's onset to the end of the trial, so it includes keys pressed after the window closed
+            data.at[i, 'n_keys'] = len(key_events)
+            for key, key_rt, key_duration in key_events:
+                logging.data('key ' + key + ' down: ' + str(key_rt) + ' held: ' + str(key_duration))
+                # resp_duration is how long the response key itself was held (empty for no response)
+                if resp is not None and key == resp and key_rt == rt and key_duration is not None:
+                    data.at[i, 'resp_duration'] = key_duration
+            logging.flush()
+
+            data.at[i, 'item'] = timeline.items[i]
+            data.at[i, 'globaltime'] = clock.getTime()
+            timing = recorder.trial_stats()
+            for key in ['onset', 'duration', 'requested', 'n_flips', 'dropped']:
+                data.at[i, key] = timing[key]
+            if timing['dropped'] > 0:
+                logging.warning('trial ' + str(i) + ' dropped ' + str(timing['dropped']) + ' frames')
+            for segment in recorder.segment_stats():
+                logging.exp('segment ' + SEGMENT_NAMES[segment['kind']] + ' requested: ' + str(segment['requested'])
+                            + ' achieved: ' + str(round(segment['achieved'], 2))
+                            + ' frames: ' + str(segment['n_flips']))
+
+            # written out while the blank at the end of the trial is still up
+            writer.append(data.row(i))
+            trial_ans = None if corr_ans is None else corr_ans[i]
+            stats.add(resp, rt, trial_ans, timing['dropped'])
+            send('trial', session=session, trial=i, n_trials=n_trials, item=timeline.items[i],
+                 resp=resp, rt=rt, corr_ans=trial_ans, duration=timing['duration'],
+                 requested=timing['requested'], dropped=timing['dropped'], stats=stats.fields())
+        send('end', session=session, stats=stats.fields())
+    finally:
+        prefetcher.close()
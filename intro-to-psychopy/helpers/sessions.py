@@ -0,0 +1,195 @@
+"""
+Run the set 3 experiment for several subjects in a row without closing the window.
+
+set3/gui_and_logging.py ends with core.quit(), so every subject pays again for
+starting python, the gui dialog, opening the fullscreen window and building
+the text stimuli. SessionRunner does all of that once: it opens the window,
+loads the stimuli, compiles the timeline and warms the text stimuli, and then
+runs one session per subject on the same window, each with its own data file
+and log file (named like set3's, ie. set3/sample_beh_001.csv and .log).
+
+The subjects come from a csv with the columns of the gui (exp, SubjID, type)
+and/or from the command line:
+
+    python helpers/sessions.py --queue subjects.csv
+    python helpers/sessions.py --subject 001 --subject 002 --type beh
+
+Between subjects the instructions of the next session stay on the screen
+until the space bar is pressed; escape there stops the queue. The trials are
+run by the same loop as set 3's (helpers/session_loop.py), and --resume
+continues every subject from their partial data file, as the set 3 gui's
+resume box does.
+"""
+from __future__ import absolute_import, division, print_function
+import argparse
+import csv
+import io
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+QUEUE_COLUMNS = ['exp', 'SubjID', 'type']
+
+
+def read_queue(path, defaults=None):
+    # [{'exp': ..., 'SubjID': ..., 'type': ...}, ...] from a csv with (some of) those columns
+    defaults = defaults or {}
+    with io.open(path, 'r', encoding='utf8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    queue = []
+    for line, row in enumerate(rows, 2):
+        config = dict(defaults)
+        config.update((name, value.strip()) for name, value in row.items() if name in QUEUE_COLUMNS and value)
+        missing = [name for name in QUEUE_COLUMNS if not config.get(name)]
+        if missing:
+            raise ValueError(path + ' line ' + str(line) + ': no ' + ', '.join(missing))
+        queue.append(config)
+    return queue
+
+
+def exp_summary(config):
+    # same name as the set 3 script gives its output files, ie. sample_beh_001
+    return config['exp'] + '_' + config['type'] + '_' + config['SubjID']
+
+
+class SessionRunner(object):
+
+    def __init__(self, win, stim_file, out_dir, true_key='period', false_key='slash',
+                 dur_word=1000, dur_blank=500, dur_response=1000, dur_timeout=500, save_every=1,
+                 hold=False, prefetch_depth=2, monitor=None):
+        # durations in ms, as in set3/gui_and_logging.py
+        from psychopy import visual
+        from helpers.frame_timing import FlipRecorder, measure_frame_period
+        from helpers.keyboard import ResponseKeyboard
+        from helpers.stim_loader import load_stimuli
+        from helpers.text_cache import TextStimCache
+        from helpers.timeline import compile_timeline
+
+        self.win = win
+        self.out_dir = out_dir
+        self.keys = [true_key, false_key]
+        self.save_every = save_every
+        self.hold = hold
+        self.prefetch_depth = prefetch_depth
+        # a helpers.monitor.MonitorClient to send the trials to, instead of printing them
+        self.monitor = monitor
+
+        # everything below is shared by all the sessions
+        frame_period = measure_frame_period(win)
+        self.recorder = FlipRecorder(frame_period)
+        self.keyboard = ResponseKeyboard(self.keys)
+        self.instructions = visual.TextStim(win=win, text="", font='Arial',
+            pos=(0, 0), height=0.9, wrapWidth=None, ori=0,
+            color='white', colorSpace='rgb', opacity=1, depth=0.0, units='cm')
+        self.text_stims = TextStimCache(win, font='Arial', height=0.9, units='cm',
+            pos=(0, 0), wrapWidth=None, ori=0, color='white', colorSpace='rgb', opacity=1)
+        self.stim = load_stimuli(stim_file)
+        self.timeline = compile_timeline(self.stim, frame_period, dur_word=dur_word, dur_blank=dur_blank,
+            dur_response=dur_response, dur_timeout=dur_timeout)
+        self.text_stims.warm(self.timeline.texts)
+
+    def show(self, text):
+        self.instructions.text = text
+        self.instructions.draw()
+        self.win.flip()
+
+    def run(self, config, resume=False):
+        """
+        One session of the experiment for config (exp, SubjID, type), as in
+        set3/gui_and_logging.py. With resume, the session continues after the
+        trials already in its partial data file. Returns the path of the data
+        file, or None if escape was pressed on the instructions.
+        """
+        from psychopy import core, event, logging
+        from helpers.async_log import AsyncLogFile
+        from helpers.monitor import MonitorClient
+        from helpers.session_loop import ENDING_TEXT, INTRO_TEXT, open_results, run_trials
+
+        summary = exp_summary(config)
+        data_file = os.path.join(self.out_dir, summary + '.csv')
+        self.show(INTRO_TEXT)
+        if event.waitKeys(keyList=['space', 'escape'])[0] == 'escape':
+            return None
+
+        data, data_writer, start = open_results(data_file, self.timeline, self.keys, save_every=self.save_every,
+                                                resume=resume)
+        # every session gets its own clock and log file
+        global_clock = core.Clock()
+        logging.setDefaultClock(global_clock)
+        logging.console.setLevel(logging.ERROR)
+        log_file = AsyncLogFile(os.path.join(self.out_dir, summary + '.log'), filemode='a' if resume else 'w',
+                                level=logging.DEBUG)
+        monitor = self.monitor
+        if monitor is None:
+            monitor = MonitorClient()
+        try:
+            run_trials(self.win, self.timeline, self.text_stims, self.keyboard, self.recorder, data, data_writer,
+                       global_clock, start=start, corr_ans=self.stim['corrAns'], hold=self.hold,
+                       prefetch_depth=self.prefetch_depth, monitor=monitor, session=summary)
+            self.show(ENDING_TEXT)
+            data.to_dataframe().to_csv(data_file, index=False)
+            data_writer.close(remove=True)
+        finally:
+            # also when the session crashed: the partial data file and the log keep everything recorded so far
+            data_writer.close()
+            log_file.close()
+            if monitor is not self.monitor:
+                monitor.close()
+        return data_file
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run the set 3 experiment for a queue of subjects on one window.')
+    parser.add_argument('--queue', help='csv with the columns exp, SubjID, type')
+    parser.add_argument('--subject', action='append', default=[], help='SubjID to run (after the --queue ones)')
+    parser.add_argument('--exp', default='sample')
+    parser.add_argument('--type', default='beh')
+    parser.add_argument('--stim-file', default=os.path.join(ROOT_DIR, 'stimuli', 'sample_stimuli.csv'))
+    parser.add_argument('--out-dir', default=os.path.join(ROOT_DIR, 'set3'))
+    parser.add_argument('--windowed', action='store_true', help='800x800 window instead of fullscreen')
+    parser.add_argument('--headless', action='store_true', help='use the fake psychopy of helpers/headless.py')
+    parser.add_argument('--monitor', action='store_true', help='open the experimenter monitor in this terminal')
+    parser.add_argument('--resume', action='store_true', help='continue each session from its partial data file')
+    parser.add_argument('--hold', action='store_true',
+                        help="draw each word only on its first frames (helpers/player.py's hold mode, check it first)")
+    args = parser.parse_args(argv)
+
+    defaults = {'exp': args.exp, 'type': args.type}
+    queue = read_queue(args.queue, defaults) if args.queue else []
+    for subj_id in args.subject:
+        queue.append(dict(defaults, SubjID=subj_id))
+    if not queue:
+        parser.error('no subjects, use --queue and/or --subject')
+
+    if args.headless:
+        from helpers.headless import install
+        install()
+    from psychopy import core, visual
+    from helpers.monitor import MonitorClient, start_monitor
+
+    monitor = MonitorClient()
+    monitor_process = start_monitor(exit_after_session=False) if args.monitor else None
+
+    win = visual.Window([800, 800], fullscr=not args.windowed, monitor='testMonitor',
+                        color=[0, 0, 0], colorSpace='rgb')
+    runner = SessionRunner(win, args.stim_file, args.out_dir, hold=args.hold, monitor=monitor)
+    for n, config in enumerate(queue):
+        start = time.time()
+        data_file = runner.run(config, resume=args.resume)
+        if data_file is None:
+            print('stopped before ' + exp_summary(config) + ', ' + str(len(queue) - n) + ' subject(s) not run')
+            break
+        print('saved ' + data_file + ' (' + str(round(time.time() - start, 1)) + ' s)')
+    core.wait(2)
+    monitor.close()
+    if monitor_process is not None:
+        monitor_process.terminate()
+    core.quit()
+
+
+if __name__ == '__main__':
+    main()
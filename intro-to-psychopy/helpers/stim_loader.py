@@ -0,0 +1,213 @@
+"""
+Load a stimulus csv once, check it, and keep a binary copy for the next sessions.
+
+pd.read_csv(stim_file, sep=None, engine='python') parses the file with the slow
+pure-Python parser every time a session starts. load_stimuli() instead:
+
+1. hashes the csv's content and looks for a cache made from the same content
+   in stimuli/.cache/<file name>-<hash>/
+2. if there is none, reads the csv with the C parser, checks it against
+   STIM_SCHEMA, splits every stopword phrase into words and writes the
+   columns as .npy files to the cache
+3. opens the cached .npy files memory-mapped, so nothing is parsed or copied
+
+Text columns are stored as integer codes into a vocabulary of unique strings,
+and the stopword words as one flat array of codes plus the offset of each
+row's first word.
+"""
+from __future__ import absolute_import, division, print_function
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import numpy as np
+
+# column -> kind ('text', 'float' or 'int'), in the order of sample_stimuli.csv
+STIM_SCHEMA = [
+    ('concept', 'text'),
+    ('stopword', 'text'),
+    ('target', 'text'),
+    ('cos', 'float'),
+    ('cond', 'int'),
+    ('corrAns', 'text'),
+]
+# bump this when the cache layout changes, so old caches are not used
+CACHE_VERSION = 1
+
+
+def file_hash(path, block_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class StimulusPool(object):
+    """
+    Stimulus columns loaded by load_stimuli.
+    pool['concept'] gives a column as a numpy array (strings for text columns),
+    pool.codes('concept') and pool.vocab('concept') the encoded form without
+    decoding anything, and pool.stopword_tokens() the words of every stopword phrase.
+    """
+
+    def __init__(self, arrays, n_rows):
+        self._arrays = arrays
+        self.n_rows = n_rows
+        self.columns = [name for name, kind in STIM_SCHEMA]
+
+    def __len__(self):
+        return self.n_rows
+
+    def __getitem__(self, name):
+        if name + '.codes' in self._arrays:
+            return self.vocab(name)[self.codes(name)]
+        return self._arrays[name]
+
+    def codes(self, name):
+        return self._arrays[name + '.codes']
+
+    def vocab(self, name):
+        return self._arrays[name + '.vocab']
+
+    def stopword_tokens(self):
+        # list of lists of words, one per row
+        vocab = self._arrays['stopword_tokens.vocab'].tolist()
+        codes = self._arrays['stopword_tokens.codes'].tolist()
+        offsets = self._arrays['stopword_tokens.offsets'].tolist()
+        return [[vocab[c] for c in codes[offsets[i]:offsets[i + 1]]] for i in range(self.n_rows)]
+
+    def to_dataframe(self):
+        import pandas as pd
+        return pd.DataFrame(dict((name, self[name]) for name in self.columns), columns=self.columns)
+
+
+def read_stim_csv(path):
+    """
+    Read and check a stimulus csv with pandas' C parser.
+    Raises ValueError when columns are missing, text cells are empty or numbers don't parse.
+    """
+    import pandas as pd
+    dtypes = {'text': object, 'float': np.float64, 'int': np.float64}
+    names = [name for name, kind in STIM_SCHEMA]
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    missing = [name for name in names if name not in header]
+    if missing:
+        raise ValueError(path + ' is missing the columns ' + str(missing))
+    try:
+        stim = pd.read_csv(path, usecols=names, dtype=dict((name, dtypes[kind]) for name, kind in STIM_SCHEMA),
+                           keep_default_na=False, na_values={'cos': [''], 'cond': ['']})
+    except ValueError as e:
+        raise ValueError(path + ': ' + str(e))
+
+    for name, kind in STIM_SCHEMA:
+        column = stim[name]
+        if kind == 'text':
+            bad = np.flatnonzero(column.str.strip().to_numpy() == '')
+        else:
+            bad = np.flatnonzero(column.isna().to_numpy())
+        if kind == 'int' and not len(bad):
+            bad = np.flatnonzero(column.to_numpy() != np.round(column.to_numpy()))
+        if len(bad):
+            # +2: header line and 1-based line numbers
+            raise ValueError(path + ': bad ' + name + ' value on line(s) ' + str((bad[:10] + 2).tolist()))
+    stim['cond'] = stim['cond'].astype(np.int64)
+    return stim
+
+
+def _encode(values):
+    vocab, codes = np.unique(np.asarray(values, dtype=object), return_inverse=True)
+    return np.asarray(vocab.tolist(), dtype=np.str_), codes.astype(np.int32)
+
+
+def _build_arrays(stim):
+    arrays = {}
+    for name, kind in STIM_SCHEMA:
+        if kind == 'text':
+            arrays[name + '.vocab'], arrays[name + '.codes'] = _encode(stim[name].to_numpy())
+        else:
+            arrays[name] = stim[name].to_numpy(dtype=np.float64 if kind == 'float' else np.int64)
+
+    tokens = [phrase.split() for phrase in stim['stopword'].tolist()]
+    offsets = np.zeros(len(tokens) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(words) for words in tokens])
+    flat = [word for words in tokens for word in words]
+    if flat:
+        vocab, codes = _encode(flat)
+    else:
+        vocab, codes = np.zeros(0, dtype=np.str_), np.zeros(0, dtype=np.int32)
+    arrays['stopword_tokens.vocab'] = vocab
+    arrays['stopword_tokens.codes'] = codes
+    arrays['stopword_tokens.offsets'] = offsets
+    return arrays
+
+
+def cache_dir_for(path, digest, cache_root=None):
+    if cache_root is None:
+        cache_root = os.path.join(os.path.dirname(os.path.abspath(path)), '.cache')
+    return os.path.join(cache_root, os.path.basename(path) + '-' + digest[:16])
+
+
+def _write_cache(cache_dir, arrays, n_rows, digest):
+    parent = os.path.dirname(cache_dir)
+    if not os.path.isdir(parent):
+        os.makedirs(parent)
+    # write everything into a temporary folder and rename it into place at the end,
+    # so a half-written cache is never picked up
+    tmp_dir = tempfile.mkdtemp(dir=parent)
+    for key, array in arrays.items():
+        np.save(os.path.join(tmp_dir, key + '.npy'), array)
+    with open(os.path.join(tmp_dir, 'meta.json'), 'w') as f:
+        json.dump({'version': CACHE_VERSION, 'sha1': digest, 'n_rows': n_rows, 'arrays': sorted(arrays)}, f)
+    try:
+        os.rename(tmp_dir, cache_dir)
+        return
+    except OSError:
+        pass
+    if _read_cache(cache_dir, digest) is None:
+        # a stale cache (older CACHE_VERSION, or left half-written without meta.json) is in the way:
+        # move it aside first, so the folder is never missing for long, and put the new one in its place
+        stale_dir = tmp_dir + '.stale'
+        try:
+            os.rename(cache_dir, stale_dir)
+            shutil.rmtree(stale_dir, ignore_errors=True)
+            os.rename(tmp_dir, cache_dir)
+            return
+        except OSError:
+            pass
+    # another session wrote the same cache first
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def _read_cache(cache_dir, digest):
+    meta_file = os.path.join(cache_dir, 'meta.json')
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file) as f:
+        meta = json.load(f)
+    if meta.get('version') != CACHE_VERSION or meta.get('sha1') != digest:
+        return None
+    arrays = dict((key, np.load(os.path.join(cache_dir, key + '.npy'), mmap_mode='r')) for key in meta['arrays'])
+    return StimulusPool(arrays, meta['n_rows'])
+
+
+def load_stimuli(path, cache_root=None, use_cache=True):
+    """
+    Load a stimulus csv as a StimulusPool, from the binary cache when the csv hasn't changed.
+    cache_root defaults to a .cache folder next to the csv.
+    """
+    digest = file_hash(path)
+    cache_dir = cache_dir_for(path, digest, cache_root)
+    if use_cache:
+        pool = _read_cache(cache_dir, digest)
+        if pool is not None:
+            return pool
+
+    stim = read_stim_csv(path)
+    arrays = _build_arrays(stim)
+    if not use_cache:
+        return StimulusPool(arrays, len(stim))
+    _write_cache(cache_dir, arrays, len(stim), digest)
+    pool = _read_cache(cache_dir, digest)
+    return pool if pool is not None else StimulusPool(arrays, len(stim))
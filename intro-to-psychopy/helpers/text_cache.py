@@ -0,0 +1,70 @@
+"""
+Cache of ready-to-draw TextStims, one per word.
+
+Setting stimText.text makes PsychoPy lay out the text again and upload a new
+glyph texture on the next draw, which lands on the very first frame of the
+word (the one we log with win.logOnFlip). Keeping a TextStim per word and
+building them all before the trials start means switching words is only
+picking another object out of a dict.
+
+Stims are keyed by (text, font, height, units) and the least recently used
+ones are dropped once the cache holds maxsize of them.
+"""
+from __future__ import absolute_import, division, print_function
+from collections import OrderedDict
+from psychopy import visual
+
+
+class TextStimCache(object):
+
+    def __init__(self, win, maxsize=2048, font='Arial', height=0.9, units='cm', **stim_kwargs):
+        # stim_kwargs are passed to every visual.TextStim, ie. pos, color, wrapWidth
+        self.win = win
+        self.maxsize = maxsize
+        self.font = font
+        self.height = height
+        self.units = units
+        self.stim_kwargs = stim_kwargs
+        self._stims = OrderedDict()
+
+    def __len__(self):
+        return len(self._stims)
+
+    def __contains__(self, key):
+        return key in self._stims
+
+    def cached(self, text):
+        # whether text has a stim with the default font, height and units
+        return (text, self.font, self.height, self.units) in self._stims
+
+    def get(self, text, font=None, height=None, units=None):
+        # return the TextStim showing text, building it if it isn't cached yet
+        key = (text, font or self.font, height or self.height, units or self.units)
+        stim = self._stims.get(key)
+        if stim is not None:
+            self._stims.move_to_end(key)
+            return stim
+
+        stim = visual.TextStim(win=self.win, text=text, font=key[1], height=key[2],
+            units=key[3], **self.stim_kwargs)
+        self._stims[key] = stim
+        if len(self._stims) > self.maxsize:
+            self._stims.popitem(last=False)
+        return stim
+
+    def warm(self, texts, draw=True):
+        """
+        Build (and by default draw once) a TextStim for each of texts, so the
+        glyph textures are uploaded before the first trial.
+        Only the first maxsize texts are warmed as the rest would be evicted anyway.
+        The warm-up draws go to the back buffer, which is cleared afterwards so
+        nothing shows up on the next flip.
+        """
+        texts = list(texts)[:self.maxsize]
+        for text in texts:
+            stim = self.get(text)
+            if draw:
+                stim.draw()
+        if draw:
+            self.win.clearBuffer()
+        return len(texts)
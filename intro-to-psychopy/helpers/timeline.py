@@ -0,0 +1,143 @@
+"""
+Compile the stimulus file into a flat, frame-exact trial timeline.
+
+Building a trial on the fly means splitting the stopwords, concatenating log
+messages and looping over blank screens while the window is flipping.
+All of that can be worked out before the session starts, so here every row
+of the stimulus file is turned into a run of segments:
+
+blank > concept > blank > (stopword > blank) x N > target > response > blank > [timeout > blank]
+
+Each segment says which text to show, for how long (in ms, and in frames of
+the measured refresh period), which message to log on its first flip and
+whether the keyboard should be polled.
+The two segments in brackets are only shown when no response was made.
+"""
+from __future__ import absolute_import, division, print_function
+import numpy as np
+
+from helpers.frame_timing import ms_to_frames
+
+# segment kinds
+BLANK, CONCEPT, STOPWORD, TARGET, RESPONSE, TIMEOUT = range(6)
+SEGMENT_NAMES = ('blank', 'concept', 'stopword', 'target', 'response', 'timeout')
+
+SEGMENT_DTYPE = np.dtype([
+    ('trial', np.int32),          # row of the stimulus file
+    ('kind', np.int8),            # one of the segment kinds above
+    ('text_id', np.int32),        # index into Timeline.texts
+    ('frames', np.int32),         # number of refreshes to hold the text
+    ('duration', np.float64),     # requested duration in ms
+    ('log_id', np.int32),         # index into Timeline.log_msgs, -1 if nothing is logged
+    ('response', np.bool_),       # poll the keyboard during this segment
+    ('timeout_only', np.bool_),   # only shown when no response was made
+])
+
+BLANK_TEXT = " "
+RESPONSE_TEXT = 'True or False?'
+TIMEOUT_TEXT = 'TIME OUT!'
+
+# log messages written on the first flip of each segment kind
+LOG_PREFIX = {
+    CONCEPT: 'start concept word: ',
+    STOPWORD: 'start stopwords: ',
+    TARGET: 'start target word: ',
+    RESPONSE: 'start response: ',
+    TIMEOUT: 'start time out: ',
+}
+
+
+class Timeline(object):
+    """
+    Flat array of segments for a whole session.
+
+    segments    -- structured array with SEGMENT_DTYPE
+    trial_start -- trial i owns segments[trial_start[i]:trial_start[i + 1]]
+    texts       -- unique strings shown on the screen, text_id indexes into it
+    log_msgs    -- messages for win.logOnFlip, log_id indexes into it
+    items       -- full sentence of each trial, saved as 'item' in the data
+    frame_period -- refresh period (s) the frame counts were worked out for
+    """
+
+    def __init__(self, segments, trial_start, texts, log_msgs, items, frame_period):
+        self.segments = segments
+        self.frame_period = frame_period
+        self.trial_start = trial_start
+        self.texts = texts
+        self.log_msgs = log_msgs
+        self.items = items
+
+    def __len__(self):
+        return len(self.items)
+
+    def trial(self, i):
+        # list of segment tuples (in SEGMENT_DTYPE field order) of trial i
+        # plain tuples are much cheaper to walk than numpy records; they are made
+        # per trial, between trials, so the whole session stays one compact array
+        return self.segments[self.trial_start[i]:self.trial_start[i + 1]].tolist()
+
+    def n_frames(self, i, responded=True):
+        # number of flips trial i takes, with or without the time out segments
+        seg = self.segments[self.trial_start[i]:self.trial_start[i + 1]]
+        if responded:
+            seg = seg[~seg['timeout_only']]
+        return int(seg['frames'].sum())
+
+
+def compile_timeline(stim, frame_period=1.0 / 60, dur_word=1000, dur_blank=500, dur_response=1000, dur_timeout=500):
+    """
+    Turn the stimulus DataFrame (concept, stopword, target columns), or a
+    helpers.stim_loader.StimulusPool, into a Timeline.
+    Durations are in ms, frame_period (s) is the window's measured refresh
+    period, see helpers.frame_timing.measure_frame_period.
+    """
+    texts = [BLANK_TEXT]
+    text_ids = {BLANK_TEXT: 0}
+    log_msgs = []
+    log_ids = {}
+    rows = []
+    trial_start = [0]
+    items = []
+
+    def text_id(text):
+        if text not in text_ids:
+            text_ids[text] = len(texts)
+            texts.append(text)
+        return text_ids[text]
+
+    def add(trial, kind, text, duration, response=False, timeout_only=False):
+        log_id = -1
+        if kind in LOG_PREFIX:
+            msg = LOG_PREFIX[kind] + text
+            if msg not in log_ids:
+                log_ids[msg] = len(log_msgs)
+                log_msgs.append(msg)
+            log_id = log_ids[msg]
+        rows.append((trial, kind, text_id(text), ms_to_frames(duration, frame_period), duration,
+                     log_id, response, timeout_only))
+
+    concepts = stim['concept'].tolist()
+    stopwords = stim['stopword'].tolist()
+    targets = stim['target'].tolist()
+    if hasattr(stim, 'stopword_tokens'):
+        # already split into words by the loader
+        stopword_tokens = stim.stopword_tokens()
+    else:
+        stopword_tokens = [phrase.split() for phrase in stopwords]
+    for i in range(0, len(concepts)):
+        add(i, BLANK, BLANK_TEXT, dur_blank)
+        add(i, CONCEPT, concepts[i], dur_word)
+        add(i, BLANK, BLANK_TEXT, dur_blank)
+        for word in stopword_tokens[i]:
+            add(i, STOPWORD, word, dur_word)
+            add(i, BLANK, BLANK_TEXT, dur_blank)
+        add(i, TARGET, targets[i], dur_word)
+        add(i, RESPONSE, RESPONSE_TEXT, dur_response, response=True)
+        add(i, BLANK, BLANK_TEXT, dur_blank)
+        add(i, TIMEOUT, TIMEOUT_TEXT, dur_timeout, timeout_only=True)
+        add(i, BLANK, BLANK_TEXT, dur_blank, timeout_only=True)
+        trial_start.append(len(rows))
+        items.append(concepts[i] + ' ' + stopwords[i] + ' ' + targets[i])
+
+    segments = np.array(rows, dtype=SEGMENT_DTYPE)
+    return Timeline(segments, np.array(trial_start, dtype=np.int64), texts, log_msgs, items, frame_period)
@@ -80,7 +80,7 @@ endingText = "Your thank you text here"
 #-----------------------------------------------------------------------#
 # Q4. Specify the variable for stim_file below so that the script can locate sample_stimuli.csv file in /stimuli folder
 stim_file = stimDir + '/sample_stimuli.csv'
-stim = pd.read_csv(stim_file, None, engine='python')
+stim = pd.read_csv(stim_file, sep=None, engine='python')
 
 # assign each column values as variables
 stim_concept = stim['concept']
@@ -72,7 +72,7 @@ endingText = "EMPTY TEXT"
 # Q4. Change the variable stim_file below so that the script can locate sample_stimuli.csv file in /stimuli folder
 stim_file = stimDir
 
-stim = pd.read_csv(stim_file, None, engine='python')
+stim = pd.read_csv(stim_file, sep=None, engine='python')
 
 # assign each column values as variables
 stim_concept = stim['concept']
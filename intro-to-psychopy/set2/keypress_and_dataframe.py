@@ -92,7 +92,7 @@ endingText = "You are done with the experiment!"
 # Read in stimuli file
 #-----------------------------------------------------------------------#
 stim_file = stimDir + '/sample_stimuli.csv'
-stim = pd.read_csv(stim_file, None, engine='python')
+stim = pd.read_csv(stim_file, sep=None, engine='python')
 
 # assign each column values as variables
 stim_concept = stim['concept']
@@ -18,30 +18,48 @@ from __future__ import absolute_import, division, print_function
 import os
 import sys
 import random
-import pandas as pd
-from builtins import range
 from psychopy import visual, event, gui, core, logging
-import numpy as np
 
 # avoid getting .pyc files
 sys.dont_write_bytecode = True
 
 # setup the project path (Do not change)
 # this will assign rootDir as the root of your cloned project
-rootDir = os.getcwd()
-while os.path.basename(rootDir) != 'intro-to-psychopy':
-    os.chdir('..')
+# (when started from helpers/launcher.py, the launcher has already found it)
+rootDir = os.environ.get('INTRO_PSYCHOPY_ROOT')
+if rootDir is None:
     rootDir = os.getcwd()
-rootDir = os.getcwd()
+    while os.path.basename(rootDir) != 'intro-to-psychopy':
+        os.chdir('..')
+        rootDir = os.getcwd()
+os.chdir(rootDir)
 setDir = rootDir + '/set3'
 stimDir = rootDir + '/stimuli'
+# make the shared helpers folder importable
+sys.path.insert(0, rootDir)
+from helpers.timeline import compile_timeline
+from helpers.session_loop import ENDING_TEXT, INTRO_TEXT, open_results, run_trials
+from helpers.text_cache import TextStimCache
+from helpers.monitor import MonitorClient, start_monitor
+from helpers.frame_timing import FlipRecorder, measure_frame_period
+from helpers.async_log import AsyncLogFile
+from helpers.keyboard import ResponseKeyboard
+from helpers.stim_loader import load_stimuli
 
 # Experiment Parameter
 #-----------------------------------------------------------------------#
 trueKey = 'period'
 falseKey = 'slash'
 fullscreen = True
-dur_blank = 30
+# durations are in milliseconds, and turned into frames of the monitor's measured refresh rate
+dur_word = 1000
+dur_blank = 500
+dur_response = 1000
+dur_timeout = 500
+save_every = 1  # number of trials to collect before writing them to the partial data file
+hold_static = False  # True: draw each word only on its first frames and then just flip (see helpers/player.py, check on this machine first)
+prefetch_depth = 2  # number of trials ahead whose words are made ready while the current trial runs
+show_monitor = True  # open the experimenter monitor (helpers/monitor.py) in this terminal
 
 # 1. Adding Simple Graphic User Interface for Experimenter
 #-----------------------------------------------------------------------#
@@ -63,6 +81,8 @@ gui.addFixedField("exp:", 'sample')
 gui.addField("SubjID:", '001')
 gui.addField("type:", 'beh')
 # ---YOUR CODE END---
+# tick this to continue a session that crashed, from the first trial missing in its data file
+gui.addField("resume:", False)
 
 gui.show()
 if not gui.OK:
@@ -78,10 +98,19 @@ exp_name = gui.data[0]  # this will return sample
 subj_id = gui.data[1]
 exp_type = gui.data[2]
 # ---YOUR CODE END---
+resume = gui.data[3]
 
 # if you did the above correctly, exp_summary should print 'sample001beh'
 exp_summary = exp_name + '_' + exp_type + '_'  + subj_id
 print('exp summary: ' + str(exp_summary))
+data_file = setDir + '/' + str(exp_summary) + '.csv'
+
+# instead of printing from the trial loop, progress is sent to the experimenter monitor,
+# a separate process, so the trials never wait on the console (see helpers/monitor.py)
+# the monitor process is stopped when this script exits, also after escape or a crash
+monitor = MonitorClient()
+if show_monitor:
+    start_monitor()
 
 
 # Creating Windows
@@ -89,6 +118,15 @@ print('exp summary: ' + str(exp_summary))
 # create a window to display
 win = visual.Window([800,800], fullscr=fullscreen, monitor='testMonitor', color=[0,0,0], colorSpace='rgb')
 
+# every flip of the trials is timestamped so we can check that no frames were dropped
+# the frame period is measured from the monitor, assuming 60Hz if that fails
+frame_period = measure_frame_period(win)
+flipRecorder = FlipRecorder(frame_period)
+
+# the response keyboard timestamps keys as they happen (on its own thread),
+# measured from the flip that shows 'True or False?' (see helpers/keyboard.py)
+respKeyboard = ResponseKeyboard([trueKey, falseKey])
+
 
 # Setting text/visual components
 #-----------------------------------------------------------------------#
@@ -97,39 +135,35 @@ IntstructionText = visual.TextStim(win=win, text="", font='Arial',
     pos=(0, 0), height=0.9, wrapWidth=None, ori=0,
     color='white', colorSpace='rgb', opacity=1, depth=0.0, units='cm')
 
-stimText = visual.TextStim(win=win,text="",font='Arial',
-    pos=(0, 0), height=0.9, wrapWidth=None, ori=0,
-    color='white', colorSpace='rgb', opacity=1, units='cm')
-
-
-# helper functions
-#-----------------------------------------------------------------------#
-def show_blank_screen(frameN):
-    # show blank screen in between words
-    stimText.text = " "
-    for frameN in range(0, frameN):
-        stimText.draw()
-        win.flip()
+# instead of one stimText whose .text is changed for every word, we keep one ready-made TextStim per word
+# (see helpers/text_cache.py)
+stimTexts = TextStimCache(win, font='Arial', height=0.9, units='cm',
+    pos=(0, 0), wrapWidth=None, ori=0, color='white', colorSpace='rgb', opacity=1)
 
 
 # Setting text instructions
 #-----------------------------------------------------------------------#
 # set text instructions as variables
-# \n is for printing empty line space
-IntroText = "In this study, you will be seeing a sentence or a phrase, presented word by word. \n\nPress the spacebar to begin."
+# (the texts are in helpers/session_loop.py, which helpers/sessions.py shows too; \n is for printing empty line space)
+IntroText = INTRO_TEXT
 
-endingText = "You are done with the experiment!"
+endingText = ENDING_TEXT
 
 
 # Read in stimuli file
 #-----------------------------------------------------------------------#
 stim_file = stimDir + '/sample_stimuli.csv'
-stim = pd.read_csv(stim_file, None, engine='python')
+# load_stimuli checks the columns of the file, splits the stopwords into words,
+# and keeps a binary copy in stimuli/.cache so the next session can load it without parsing the csv again
+stim = load_stimuli(stim_file)
 
-# assign each column values as variables
-stim_concept = stim['concept']
-stim_stopword = stim['stopword']
-stim_target = stim['target']
+# compile every row into a flat timeline of segments before the session starts
+# (blank > concept > blank > stopwords > blank > target > response > blank > [time out > blank])
+# so the trial loop below only has to draw and flip, see helpers/timeline.py
+# every duration becomes the closest number of frames at frame_period,
+# and while playing, each segment is held until its requested end (see helpers/player.py)
+timeline = compile_timeline(stim, frame_period, dur_word=dur_word, dur_blank=dur_blank,
+    dur_response=dur_response, dur_timeout=dur_timeout)
 
 
 # Actual experiment code
@@ -139,6 +173,9 @@ stim_target = stim['target']
 IntstructionText.text = IntroText
 IntstructionText.draw()
 win.flip()
+# while the instructions are on the screen, build and draw once every word of the session
+# so that no word has to be laid out or uploaded on its first frame
+stimTexts.warm(timeline.texts)
 # then the event.waitKeys lets the script wait until the certain key is pressed to proceed to the next line of the script
 inst_key = event.waitKeys(keyList=['space'])
 
@@ -147,9 +184,16 @@ inst_key = event.waitKeys(keyList=['space'])
 #-----------------------------------------------------------------------#
 # dataFrame is used to keep track of all the data from the experiment
 # Pandas is a useful package in Python that helps you efficiently manage data
-# we specify the data columns as below
-data_columns = ['item','resp','rt','globaltime']
-data = pd.DataFrame(columns=data_columns)
+# (it is only imported when the data is saved at the end, so the experiment starts quicker)
+# the data columns and their types are listed in helpers/session_loop.py (DATA_COLUMNS)
+# growing a DataFrame one row at a time copies it over and over,
+# so the data is kept in arrays sized for every trial and only turned into a DataFrame when saving
+# every finished trial is also written to a partial data file right away, so a crash only loses the current trial
+# when resuming, the trials already in the partial file are read back and the experiment starts after them
+data, dataWriter, first_trial = open_results(data_file, timeline, [trueKey, falseKey], save_every=save_every,
+                                             resume=resume)
+if resume:
+    print('resuming at trial ' + str(first_trial))
 
 
 # setup a variable 'globalClock' to keep track of time
@@ -171,112 +215,26 @@ logging.setDefaultClock(globalClock)  # logging needs a timer to base on
 logging.console.setLevel(logging.ERROR)
 
 # then we have a seperate logDat file that will save out all the details. Notice we set the save out directory and the logging level as DEBUG
-logDat = logging.LogFile(setDir + '/' + str(exp_summary) + '.log', filemode='w',  # if you set this to 'a' it will append instead of overwriting
+# AsyncLogFile works like logging.LogFile, except the actual writing to the disk happens on a background thread
+# so that the trials never have to wait on the file (see helpers/async_log.py)
+logDat = AsyncLogFile(setDir + '/' + str(exp_summary) + '.log', filemode='a' if resume else 'w',  # if you set this to 'a' it will append instead of overwriting
     level=logging.DEBUG)
 
 
 #-----------------------------------------------------------------------#
-for i in range(0, len(stim)):
-    # Before beginning each stimuli, it's useful for experimenter to see what's being presented
-    print('Showing sentence ' + str(i) + ': ' + stim_concept[i] + ' ' + stim_stopword[i] + ' ' + stim_target[i])
-
-    show_blank_screen(dur_blank)
-
-    # now show concept word
-    stimText.text = stim_concept[i]
-    for frameN in range(0, 60):
-        stimText.draw()
-        # Now that we added logging to the code,
-        # we want to log all the start of each event that is happening
-        # ie. when the frame is the very first frame:
-        # Q2. Example of logging the start of concept word is shown below
-        # Now for all the events happening in the script, add the logging like below
-        # when the frame == 0
-        if frameN == 0:
-            win.logOnFlip('start concept word: ' + stim_concept[i], level=logging.DATA)
-        win.flip()
-
-    show_blank_screen(dur_blank)
-
-    current_stopword = stim_stopword[i].split()
-    for j in range(0, len(current_stopword)):
-        # show each word one at a time
-        stimText.text = current_stopword[j]
-        for frameN in range(0, 60):
-            stimText.draw()
-            # ---YOUR CODE START---
-            if frameN == 0:
-                win.logOnFlip('start stopwords: ' + stim_stopword[i], level=logging.DATA)
-            # ---YOUR CODE END---
-            win.flip()
-        show_blank_screen(dur_blank)
-
-    # show last target word
-    stimText.text = stim_target[i]
-    for frameN in range(0, 60):
-        stimText.draw()
-        # ---YOUR CODE START---
-        if frameN == 0:
-            win.logOnFlip('start stopwords: ' + stim_stopword[i], level=logging.DATA)
-        # ---YOUR CODE END---
-        win.flip()
-
-    # any keypresses that are made are saved in events keyboard buffer
-    # for example, if I pressed any keys before my response period starts,
-    # we don't want the previous keypress to interfere with any of the actual response period.
-    # thus, it is a good practice to clear out the keyboard events buffer just in case like below
-    event.clearEvents('keyboard')
-
-
-    # Get keyboard response
-    #-----------------------------------------------------------------------#
-    # after showing the last word in a sentence, display a text to get a keyboard response
-    # we first specify a text to display
-    stimText.text = 'True or False?'
-
-    keypress_rt = core.Clock()
-
-    # we will now write a for loop that shows the 'True or False?' text above for certain amount of time to get the keyboard response
-    keyPressed = False
-    for frameN in range(0, 60):
-        stimText.draw()
-        win.flip()
-        # event.getKeys is the function that commands PsychoPy to record any keys that are being pressed
-        # because we have this in the for loop above, it will try to record any keypresses being made for that period of time
-        respKey = event.getKeys(keyList=[trueKey,falseKey], modifiers=False, timeStamped=keypress_rt)
-
-        # if the keypress has been made, record the following data as below
-        if respKey and not keyPressed:
-            data.at[i, 'resp'] = respKey[0][0]
-            data.at[i, 'rt'] = respKey[0][1]
-            print('Pressed: ' + str(respKey[0][0]) + '\nRT: ' + str(respKey[0][1]))
-            keyPressed = True
-
-    show_blank_screen(dur_blank)
-
-    # if the keypress has not been made, record the following data as below
-    # also display a warning message for not pressing anything
-    if not keyPressed:
-        data.at[i, 'resp'] = '[]'
-        data.at[i, 'rt'] = '[]'
-        stimText.text = 'TIME OUT!'
-        for frameN in range(0, 30):
-            stimText.draw()
-            # ---YOUR CODE START---
-            if frameN == 0:
-                win.logOnFlip('start stopwords: ' + stim_stopword[i], level=logging.DATA)
-            # ---YOUR CODE END---
-            win.flip()
-
-        show_blank_screen(dur_blank)
-
-    # we need this line that will be saving all the log records and then spit it all out
-    # ie. its like flushing toilet
-    logging.flush()
-
-    # save to dataframe
-    data.at[i, 'item'] =  stim_concept[i] + ' ' + stim_stopword[i] + ' ' + stim_target[i]
-    data.at[i, 'globaltime'] = globalClock.getTime()
+# the trial loop is in helpers/session_loop.py (helpers/sessions.py runs the same one); for every trial it
+# - plays the whole trial: every word, blank, the response window and the time out (see helpers/player.py)
+#   the start of each word is logged on its first frame with win.logOnFlip
+#   the response is the first of trueKey/falseKey pressed while 'True or False?' is shown
+# - saves the response, every key down and up, the trial's onset, duration and dropped frames to data,
+#   and logs the keys and the requested and achieved duration (in ms) of every word, blank, etc.
+# - writes the trial to the partial data file while the blank screen at the end of the trial is still up
+# - lets the experimenter know how it went (response, accuracy, timing) on the monitor
+# words that didn't fit in stimTexts when warming up are built a few trials ahead,
+# in the spare time between the frames of the current trial (see helpers/prefetch.py)
+run_trials(win, timeline, stimTexts, respKeyboard, flipRecorder, data, dataWriter, globalClock,
+           start=first_trial, corr_ans=stim['corrAns'], hold=hold_static, prefetch_depth=prefetch_depth,
+           monitor=monitor, session=exp_summary)
 
 
 # End the experiment
@@ -285,9 +243,13 @@ IntstructionText.text = endingText
 IntstructionText.draw()
 win.flip()
 
-# reindex the dataframe just in case, and save out by specifying directory
-data = data.reindex(columns=data_columns)
-data.to_csv(setDir + '/' + str(exp_summary) + '.csv', index=False)
+# turn the data into a DataFrame, and save out by specifying directory
+# once the full data is saved, the partial file is not needed anymore
+data.to_dataframe().to_csv(data_file, index=False)
+dataWriter.close(remove=True)
+# make sure every log record is written to the log file
+logDat.close()
+monitor.close()
 
 # wait for 2 seconds and then quit out of PsychoPy
 core.wait(2)